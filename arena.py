@@ -0,0 +1,339 @@
+""" Manage all the features related to the Arena of the Tron Game: a game of
+any number of players, each one moving in turn """
+
+import random
+import time
+import numpy as np
+from player import Player
+from tracing import TraceSink
+from search import SearchableGame
+
+
+class Arena(SearchableGame):
+    """
+    A class for managing a Tron game between any number of players.
+
+    The players move one after the other, in the order of the list, and a
+    player who cannot move on its turn dies, its trail staying on the board.
+    The last player alive wins.
+
+    Every position is scored by a vector, one score per player: the empty
+    cells it reaches strictly first (multi-source Voronoi) plus one if alive,
+    0 if dead, and all the cells of the grid for the last player alive. The
+    scores are positive and their sum never exceeds the number of cells of
+    the grid, which is what the pruning of the max-n search relies on.
+
+    Two searches are available:
+        - 'paranoid': the player to move assumes that all the other players
+          play against it, an alpha-beta search of its own score where every
+          other player minimizes it (with a transposition table).
+        - 'maxn': each player maximizes its own score of the vector, with the
+          shallow pruning of the bounded sum.
+
+    The position, the journal of the moves, the transposition table (of the
+    paranoid search), the move ordering and the iterative deepening are the
+    ones of SearchableGame, whose max_depth counts plies (one move of one
+    player) and whose winner is the last player alive (None while the game
+    is ongoing, or for a draw).
+
+    Attributes:
+        over (bool): The game is over (at most one player alive).
+        algorithm (str): The name of the search ('paranoid' or 'maxn').
+        max_sum (int): The bound of the sum of the scores of a vector.
+        trace (TraceSink): The JSON-lines trace of the searches, the moves
+         and the end of the game, or None to trace nothing.
+    """
+
+    ALGORITHMS = ('paranoid', 'maxn')
+
+    def __init__(self, width: int, height: int, players: list[Player],
+                 algorithm: str = 'paranoid', table_mb: float = 16,
+                 time_budget: float | None = 0.05,
+                 max_depth: int | None = None,
+                 trace: TraceSink | None = None) -> None:
+        """
+        :param width: to define the width of the grid
+        :param height: to define the height of the grid
+        :param players: of the game, in the order they move
+        :param algorithm: name of the search, 'paranoid' or 'maxn'
+        :param table_mb: memory budget of the transposition table (megabytes)
+        :param time_budget: wall-clock time allowed per move (seconds)
+        :param max_depth: deepest iteration of the search (plies)
+        :param trace: sink of the JSON-lines trace of the game
+        """
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f'Unknown search {algorithm!r}, expected one of '
+                             f'{self.ALGORITHMS}')
+        super().__init__(self.init_grid(width, height, players), players,
+                         table_mb, time_budget, max_depth)
+        self.over = False
+        self.algorithm = algorithm
+        self.max_sum = width * height
+        self.trace = trace
+
+    @staticmethod
+    def spawn_positions(width: int, height: int, count: int,
+                        rng: random.Random) -> list[tuple[int, int]]:
+        """
+        Draw distinct spawns for the players inside the boundaries
+        :param width: of the grid
+        :param height: of the grid
+        :param count: number of players
+        :param rng: random generator (seeded to replay the same spawns)
+        :return: list of the (x, y) of each player
+        """
+        cells = [(x, y) for x in range(1, width - 1)
+                 for y in range(1, height - 1)]
+
+        return rng.sample(cells, count)
+
+    @staticmethod
+    def init_grid(width: int, height: int,
+                  players: list[Player]) -> np.ndarray:
+        """
+        Initialize the Grid: -1 for the borders, 0 for the empty cells and
+        the number of each player on its spawn
+        :param width: of the grid
+        :param height: of the grid
+        :param players: of the game
+        :return: numpy array
+        """
+        grid = np.ones((width, height), dtype=np.int8) * (-1)
+        grid[1:-1, 1:-1] = 0
+        for player in players:
+            grid[player.x, player.y] = player.number
+
+        return grid
+
+    def alive(self) -> list[Player]:
+        """
+        :return: the players still alive
+        """
+        return [player for player in self.players if not player.dead]
+
+    def next_turn(self, turn: int) -> int:
+        """
+        Get the next player alive to move
+        :param turn: index of the player who has just moved
+        :return: the index of the next player alive in the order of the game
+        """
+        count = len(self.players)
+        for step in range(1, count + 1):
+            if not self.players[(turn + step) % count].dead:
+                return (turn + step) % count
+
+        return turn
+
+    def evaluate(self) -> list[int]:
+        """
+        Score the position for every player (see the class docstring)
+        :return: the score of each player, in the order of the game
+        """
+        alive = self.alive()
+        if len(alive) <= 1:
+            return [0 if player.dead else self.max_sum
+                    for player in self.players]
+
+        board = self.board
+        territories = iter(board.territories(
+            [board.index(player.x, player.y) for player in alive]))
+
+        return [0 if player.dead else next(territories) + 1
+                for player in self.players]
+
+    def paranoid(self, depth: int, turn: int, root: int, alpha: float,
+                 beta: float) -> tuple[float, tuple[int, int]]:
+        """
+        Search the score of the root player, maximized on its turns and
+        minimized on the turns of all the other players (alpha-beta)
+        :param depth: remaining plies of the search
+        :param turn: index of the player to move
+        :param root: index of the player whose score is searched
+        :param alpha: the best score for the root player
+        :param beta: the best score for the other players
+        :return: tuple (score, move) of the best move of the player to move
+        """
+        self.visit()
+        if depth == 0 or len(self.alive()) <= 1:
+            self.line = []
+            self.stats.leaf_evals += 1
+            return self.evaluate()[root], (0, 0)
+
+        player = self.players[turn]
+        moves = self.get_allowed_moves(player)
+        # A player who cannot move dies, and the next one plays
+        if not moves:
+            self.make_move(player, None)
+            score, _ = self.paranoid(depth - 1, self.next_turn(turn), root,
+                                     alpha, beta)
+            self.unmake_move()
+            self.line = [(0, 0)] + self.line
+            return score, (0, 0)
+
+        # The position alone is not enough, the same cells can be searched
+        # for another player or with another player to move
+        key = (self.hash ^ self.zobrist.to_move[player.number]
+               ^ self.zobrist.perspective[self.players[root].number])
+        alpha_origin, beta_origin = alpha, beta
+        result, alpha, beta, table_move = self.probe_table(key, depth, alpha,
+                                                           beta)
+        if result is not None:
+            return result
+
+        ply = len(self.journal) - self.search_root
+        self.stats.interior_nodes += 1
+        maximizing = turn == root
+        best_score = float('-inf') if maximizing else float('inf')
+        best_move = None
+        best_line = []
+        for i, move in enumerate(self.order_moves(moves, ply, player,
+                                                  table_move)):
+            self.make_move(player, move)
+            score, _ = self.paranoid(depth - 1, self.next_turn(turn), root,
+                                     alpha, beta)
+            self.unmake_move()
+
+            if (score > best_score) if maximizing else (score < best_score):
+                best_score = score
+                best_move = move
+                best_line = [move] + self.line
+            if maximizing:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha:
+                self.record_cutoff(player, move, i, ply, depth)
+                break
+
+        # We save the result, as a bound if the search has been pruned
+        self.store_table(key, depth, best_score, best_move, alpha_origin,
+                         beta_origin)
+        self.line = best_line
+
+        return best_score, best_move
+
+    def maxn(self, depth: int, turn: int, parent_best: float | None = None) \
+            -> tuple[list[int], tuple[int, int]]:
+        """
+        Search the score vector reached when every player maximizes its own
+        score. As the sum of a vector is bounded by max_sum, once the player
+        to move is sure to get max_sum - parent_best, the player of the
+        parent node cannot get more than parent_best here: the other moves
+        are not searched (shallow pruning)
+        :param depth: remaining plies of the search
+        :param turn: index of the player to move
+        :param parent_best: best score of the player of the parent node among
+         its moves already searched, None at the root
+        :return: tuple (scores, move) of the best move of the player to move
+        """
+        self.visit()
+        if depth == 0 or len(self.alive()) <= 1:
+            self.line = []
+            self.stats.leaf_evals += 1
+            return self.evaluate(), (0, 0)
+
+        player = self.players[turn]
+        moves = self.get_allowed_moves(player)
+        # A player who cannot move dies, and the next one plays
+        if not moves:
+            self.make_move(player, None)
+            scores, _ = self.maxn(depth - 1, self.next_turn(turn),
+                                  parent_best)
+            self.unmake_move()
+            self.line = [(0, 0)] + self.line
+            return scores, (0, 0)
+
+        ply = len(self.journal) - self.search_root
+        self.stats.interior_nodes += 1
+        best_scores = None
+        best_move = None
+        best_line = []
+        for i, move in enumerate(self.order_moves(moves, ply, player)):
+            self.make_move(player, move)
+            scores, _ = self.maxn(depth - 1, self.next_turn(turn),
+                                  best_scores[turn] if best_scores else None)
+            self.unmake_move()
+
+            if best_scores is None or scores[turn] > best_scores[turn]:
+                best_scores = scores
+                best_move = move
+                best_line = [move] + self.line
+            if (parent_best is not None
+                    and best_scores[turn] >= self.max_sum - parent_best):
+                self.record_cutoff(player, move, i, ply, depth)
+                break
+        self.line = best_line
+
+        return best_scores, best_move
+
+    def search(self, turn: int) -> tuple[float, tuple[int, int]]:
+        """
+        Run the search of the game by iterative deepening until the time
+        budget or the max depth is reached, and keep the result of the
+        deepest completed iteration. Each iteration tries the principal
+        variation of the previous one first
+        :param turn: index of the player to move
+        :return: tuple (score, move) of the deepest completed iteration, the
+         score of the player to move
+        """
+        def iteration(depth: int) -> tuple[float, tuple[int, int]]:
+            if self.algorithm == 'paranoid':
+                return self.paranoid(depth, turn, turn, float('-inf'),
+                                     float('inf'))
+            scores, move = self.maxn(depth, turn)
+            return scores[turn], move
+
+        return self.deepen(iteration)
+
+    def step(self) -> None:
+        """
+        Play one turn: every player alive moves in turn, a player who cannot
+        move dies. Then check if the game is over
+        """
+        for turn, player in enumerate(self.players):
+            if player.dead or len(self.alive()) <= 1:
+                continue
+            if not self.get_allowed_moves(player):
+                player.dead = True
+                continue
+            start = time.perf_counter()
+            _, move = self.search(turn)
+            self.latencies[player.number].append(time.perf_counter() - start)
+            if self.trace is not None:
+                self.trace.emit('search', tick=self.ticks,
+                                player=player.number,
+                                algorithm=self.algorithm, move=move,
+                                **self.stats.to_dict())
+            self.advance_player(player, move)
+        self.ticks += 1
+
+        alive = self.alive()
+        if len(alive) <= 1:
+            self.over = True
+            self.winner = alive[0] if alive else None
+            if self.trace is not None:
+                self.trace.emit('game_over', tick=self.ticks,
+                                result=self.result(), nodes=self.nodes)
+
+    def play(self, max_ticks: int | None = None) -> int | None:
+        """
+        Play the game until it is over
+        :param max_ticks: maximum number of turns, None to play until the end
+        :return: the result of the game (see result)
+        """
+        while not self.over and (max_ticks is None
+                                 or self.ticks < max_ticks):
+            self.step()
+
+        return self.result()
+
+    def result(self) -> int | None:
+        """
+        Get the result of the game
+        :return: the number of the winner, 0 for a draw (every player dead)
+         or None if the game is ongoing
+        """
+        if not self.over:
+            return None
+
+        return self.winner.number if self.winner is not None else 0
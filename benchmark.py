@@ -0,0 +1,407 @@
+""" Manage all the features related to the benchmarks of the search of the
+Tron Game: a corpus of stored positions, searched to measure the speed of the
+search and the agreement of its moves with a reference search """
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game import Game
+from player import Player
+from replay import encode_grid, decode_grid
+from tournament import parse_size, parse_settings
+
+# Share of the inner cells taken by the trails at each phase of a game
+PHASES = {'opening': 0.05, 'middle': 0.25, 'late': 0.45}
+
+
+def position_game(position: dict, settings: dict, workers: int = 1,
+                  executor: ProcessPoolExecutor | None = None) \
+        -> tuple[Game, Player, Player]:
+    """
+    Build a game on a position of the corpus, the player 1 to move
+    :param position: of the corpus
+    :param settings: search settings of the player to move
+    :param workers: number of processes searching the root moves
+    :param executor: process pool of the parallel search, shared by the
+     positions as a game keeps it between its moves, or None
+    :return: tuple (game, player to move, opponent)
+    """
+    (x_1, y_1), (x_2, y_2) = position['positions']
+    player_1 = Player(x=x_1, y=y_1, number=1, color='', wall_color='',
+                      search_settings=settings)
+    player_2 = Player(x=x_2, y=y_2, number=2, color='', wall_color='')
+    game = Game(width=position['width'], height=position['height'],
+                player_1=player_1, player_2=player_2, workers=workers,
+                verbose=False)
+    game.executor = executor
+    game.load_position(decode_grid(position['grid'], position['width'],
+                                   position['height']),
+                       (x_1, y_1), (x_2, y_2))
+    game.configure_search(player_1)
+
+    return game, player_1, player_2
+
+
+def collect_positions(width: int, height: int, seed: int) -> list[dict]:
+    """
+    Play a quick game and keep the first position of each phase where both
+    players can still reach each other
+    :param width: of the board
+    :param height: of the board
+    :param seed: of the spawns
+    :return: list of positions of the corpus (without reference)
+    """
+    spawn_1, spawn_2 = Game.spawn_positions(width, height,
+                                            random.Random(seed))
+    player_1 = Player(x=spawn_1[0], y=spawn_1[1], number=1, color='',
+                      wall_color='')
+    player_2 = Player(x=spawn_2[0], y=spawn_2[1], number=2, color='',
+                      wall_color='')
+    # A shallow fixed depth, for the same games on every run
+    game = Game(width=width, height=height, player_1=player_1,
+                player_2=player_2, time_budget=None, max_depth=2,
+                verbose=False, endgame=False)
+    inner = (width - 2) * (height - 2)
+    pending = dict(PHASES)
+    positions = []
+    while pending and game.winner is None and \
+            game.is_path_between_players(player_1, player_2):
+        taken = (game.grid > 0).sum() / inner
+        for phase in [phase for phase, share in pending.items()
+                      if taken >= share]:
+            del pending[phase]
+            positions.append({
+                'id': f'{width}x{height}-{phase}-{seed}', 'width': width,
+                'height': height, 'phase': phase, 'seed': seed,
+                'tick': game.ticks,
+                'positions': [(player_1.x, player_1.y),
+                              (player_2.x, player_2.y)],
+                'grid': encode_grid(game.grid)})
+        game.step()
+
+    return positions
+
+
+def generate_corpus(sizes: list[tuple[int, int]], games: int, seed: int,
+                    reference_budget: float) -> list[dict]:
+    """
+    Collect the positions of quick games on every board size, and search
+    the reference move of each one
+    :param sizes: list of (width, height) of the boards
+    :param games: number of games per board size
+    :param seed: of the first game, the next ones use the following seeds
+    :param reference_budget: time (seconds) of the reference search of each
+     position
+    :return: list of positions of the corpus
+    """
+    corpus = []
+    for width, height in sizes:
+        for i in range(games):
+            corpus += collect_positions(width, height, seed + i)
+
+    settings = {'time_budget': reference_budget, 'max_depth': None}
+    for position in corpus:
+        game, player, opponent = position_game(position, settings)
+        score, move = game.search(player, opponent)
+        position['reference'] = {'depth': game.iterations[-1][0],
+                                 'score': score, 'move': move,
+                                 'settings': settings}
+
+    return corpus
+
+
+def evaluations_per_second(game: Game, player: Player, opponent: Player,
+                           duration: float) -> float:
+    """
+    Time the evaluation of the search on a position alone
+    :param game: on the position
+    :param player: to move
+    :param opponent: of the player to move
+    :param duration: time (seconds) spent evaluating
+    :return: evaluations per second
+    """
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        for _ in range(16):
+            game.evaluate(player, opponent)
+        calls += 16
+
+    return calls / (time.perf_counter() - start)
+
+
+def benchmark_position(position: dict, settings: dict,
+                       eval_duration: float, workers: int = 1,
+                       executor: ProcessPoolExecutor | None = None) -> dict:
+    """
+    Search a position of the corpus and measure the search
+    :param position: of the corpus
+    :param settings: search settings of the benchmark
+    :param eval_duration: time (seconds) spent timing the evaluation alone
+    :param workers: number of processes searching the root moves
+    :param executor: process pool of the parallel search, or None
+    :return: dict of the record of the position
+    """
+    game, player, opponent = position_game(position, settings, workers,
+                                           executor)
+    start = time.perf_counter()
+    score, move = game.search(player, opponent)
+    latency = time.perf_counter() - start
+    stats = game.stats
+    time_to_depth, elapsed = {}, 0.0
+    for depth, duration in sorted(stats.time_per_depth.items()):
+        elapsed += duration
+        time_to_depth[depth] = elapsed
+    reference = position.get('reference')
+    size = f"{position['width']}x{position['height']}"
+
+    return {'id': position['id'], 'size': size,
+            'phase': position['phase'], 'depth': game.iterations[-1][0],
+            'score': score, 'move': move,
+            'agrees': reference is not None
+            and tuple(reference['move']) == tuple(move),
+            'nodes': stats.nodes, 'duration': stats.duration,
+            'latency': latency,
+            'nodes_per_sec': stats.nodes_per_second(),
+            'leaf_evals_per_sec': stats.leaf_evals / stats.duration
+            if stats.duration else 0.0,
+            'evaluations_per_sec': evaluations_per_second(
+                game, player, opponent, eval_duration),
+            'cutoff_ratio': stats.cutoff_ratio(),
+            'time_to_depth': time_to_depth}
+
+
+def summarise(records: list[dict]) -> dict:
+    """
+    Aggregate the records of positions
+    :param records: of the positions searched
+    :return: dict of the medians of the speeds and of the agreement rate
+    """
+    return {'positions': len(records),
+            'agreement': sum(record['agrees'] for record in records)
+            / len(records),
+            'nodes_per_sec': statistics.median(
+                record['nodes_per_sec'] for record in records),
+            'leaf_evals_per_sec': statistics.median(
+                record['leaf_evals_per_sec'] for record in records),
+            'evaluations_per_sec': statistics.median(
+                record['evaluations_per_sec'] for record in records),
+            'depth': statistics.median(record['depth'] for record in records)}
+
+
+def start_pool(workers: int) -> tuple[ProcessPoolExecutor | None, float]:
+    """
+    Start the process pool of the parallel search, and all its processes
+    :param workers: number of processes searching the root moves, 1 for the
+     serial search (no pool)
+    :return: tuple (pool, start-up) of the pool, or None, and the time
+     (seconds) to start it
+    """
+    if workers == 1:
+        return None, 0.0
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    # Every process of the pool runs one task at least
+    list(executor.map(time.sleep, [0.01] * workers))
+
+    return executor, time.perf_counter() - start
+
+
+def run_benchmark(corpus: list[dict], settings: dict,
+                  eval_duration: float = 0.05, workers: int = 1) -> dict:
+    """
+    Search every position of the corpus
+    :param corpus: list of positions
+    :param settings: search settings of the benchmark
+    :param eval_duration: time (seconds) spent timing the evaluation alone
+     on each position
+    :param workers: number of processes searching the root moves
+    :return: dict of the report (records, summary overall, per board size
+     and per phase)
+    """
+    executor, _ = start_pool(workers)
+    start = time.perf_counter()
+    try:
+        records = [benchmark_position(position, settings, eval_duration,
+                                      workers, executor)
+                   for position in corpus]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    by_size, by_phase = {}, {}
+    for record in records:
+        by_size.setdefault(record['size'], []).append(record)
+        by_phase.setdefault(record['phase'], []).append(record)
+
+    return {'settings': settings, 'workers': workers,
+            'duration': time.perf_counter() - start,
+            'overall': summarise(records),
+            'sizes': {size: summarise(by_size[size]) for size in
+                      sorted(by_size, key=lambda size: parse_size(size))},
+            'phases': {phase: summarise(by_phase[phase]) for phase in PHASES
+                       if phase in by_phase},
+            'records': records}
+
+
+def sweep_workers(corpus: list[dict], settings: dict,
+                  workers: list[int]) -> dict:
+    """
+    Search every position of the corpus with each number of processes of
+    the parallel search (see Game.search_parallel), to measure whether it
+    pays for the start-up of its pool and the pickling of the positions
+    :param corpus: list of positions
+    :param settings: search settings of the benchmark
+    :param workers: numbers of processes to compare, the first one being
+     the reference of the speedups (1 for the serial search)
+    :return: dict of the report: for each number of processes, the time
+     (seconds) to start its pool, the median and total time per move, the
+     median depth, the speedup of the total time over the reference and
+     the share of the moves of the reference found again
+    """
+    report, reference = {}, None
+    for count in workers:
+        executor, startup = start_pool(count)
+        latencies, depths, moves = [], [], []
+        try:
+            for position in corpus:
+                game, player, opponent = position_game(position, settings,
+                                                       count, executor)
+                start = time.perf_counter()
+                _, move = game.search(player, opponent)
+                latencies.append(time.perf_counter() - start)
+                depths.append(game.iterations[-1][0]
+                              if game.iterations else 0)
+                moves.append(tuple(move))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        total = sum(latencies)
+        if reference is None:
+            reference = total, moves
+        report[count] = {
+            'startup': startup,
+            'time_per_move': statistics.median(latencies),
+            'total': total, 'depth': statistics.median(depths),
+            'speedup': reference[0] / total if total else 0.0,
+            'same_moves': sum(move == other for move, other in
+                              zip(moves, reference[1])) / len(moves)}
+
+    return {'settings': settings, 'positions': len(corpus),
+            'workers': report}
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """
+    Compare a report with the report of a previous run, position by
+    position
+    :param report: of this run
+    :param baseline: report of the previous run
+    :return: dict of the median ratio (this run over the previous one) of
+     the speeds, the agreement of both runs and the moves which changed
+    """
+    previous = {record['id']: record for record in baseline['records']}
+    pairs = [(record, previous[record['id']]) for record in report['records']
+             if record['id'] in previous]
+    if not pairs:
+        return {'positions': 0}
+
+    def ratio(key: str) -> float:
+        return statistics.median(record[key] / old[key] for record, old in
+                                 pairs if old[key])
+
+    return {'positions': len(pairs),
+            'nodes_per_sec': ratio('nodes_per_sec'),
+            'evaluations_per_sec': ratio('evaluations_per_sec'),
+            'agreement': (sum(record['agrees'] for record, _ in pairs)
+                          / len(pairs),
+                          sum(old['agrees'] for _, old in pairs)
+                          / len(pairs)),
+            'changed_moves': [record['id'] for record, old in pairs
+                              if tuple(record['move']) != tuple(old['move'])]}
+
+
+def main() -> None:
+    """
+    Parse the command line, then generate the corpus, run the benchmark or
+    sweep the numbers of workers
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the search of '
+                                                 'the Tron Game on stored '
+                                                 'positions')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='generate the corpus')
+    generate.add_argument('--sizes', nargs='+',
+                          default=['8x8', '16x16', '32x32', '64x64'],
+                          help='board sizes, as WIDTHxHEIGHT')
+    generate.add_argument('--games', type=int, default=3,
+                          help='number of games per board size')
+    generate.add_argument('--seed', type=int, default=0,
+                          help='seed of the spawns of the first game')
+    generate.add_argument('--reference-budget', type=float, default=1.0,
+                          help='time (seconds) of the reference searches')
+    generate.add_argument('--corpus', default='benchmark_positions.jsonl',
+                          help='JSON-lines file of the positions')
+    run = commands.add_parser('run', help='search the positions')
+    run.add_argument('--corpus', default='benchmark_positions.jsonl',
+                     help='JSON-lines file of the positions')
+    run.add_argument('--settings', default='time_budget=none,max_depth=6',
+                     help='search settings, as '
+                          'time_budget=0.05,max_depth=7,evaluator=voronoi')
+    run.add_argument('--output', default='benchmark.json',
+                     help='JSON report file')
+    run.add_argument('--compare', default=None,
+                     help='JSON report of a previous run to compare with')
+    run.add_argument('--workers', type=int, default=1,
+                     help='number of processes searching the root moves')
+    sweep = commands.add_parser('sweep', help='search the positions with '
+                                              'several numbers of workers')
+    sweep.add_argument('--corpus', default='benchmark_positions.jsonl',
+                       help='JSON-lines file of the positions')
+    sweep.add_argument('--settings', default='time_budget=none,max_depth=6',
+                       help='search settings, as '
+                            'time_budget=0.05,max_depth=7,evaluator=voronoi')
+    sweep.add_argument('--workers', type=int, nargs='+',
+                       default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                       help='numbers of processes searching the root '
+                            'moves, the first one as the reference')
+    sweep.add_argument('--output', default='benchmark_workers.json',
+                       help='JSON report file')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        corpus = generate_corpus([parse_size(size) for size in args.sizes],
+                                 args.games, args.seed, args.reference_budget)
+        with open(args.corpus, 'w') as file:
+            for position in corpus:
+                file.write(json.dumps(position) + '\n')
+        print(f'{len(corpus)} positions written to {args.corpus}')
+        return
+
+    with open(args.corpus) as file:
+        corpus = [json.loads(line) for line in file if line.strip()]
+    if args.command == 'sweep':
+        report = sweep_workers(corpus, parse_settings(args.settings),
+                               args.workers)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(json.dumps(report, indent=2))
+        return
+
+    report = run_benchmark(corpus, parse_settings(args.settings),
+                           workers=args.workers)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            report['comparison'] = compare(report, json.load(file))
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(json.dumps({key: report[key] for key in report
+                      if key != 'records'}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+""" Manage all the features related to the Board (bitboard) for the Tron Game """
+
+import numpy as np
+
+
+class Board:
+    """
+    A class for managing the bitboard representation of the Tron game grid.
+
+    Every cell (x, y) is stored as the bit x * height + y of a single Python
+    int, in the same row-major order as the numpy grid of the Game. The border
+    of the grid is a wall, so moving from an inner cell never leaves the board.
+
+    Attributes:
+        width (int): The width of the game grid.
+        height (int): The height of the game grid.
+        full (int): A bitmask with every cell of the grid set.
+        walls (int): A bitmask of the walls of the map (the border).
+        trails (dict): The bitmask of the cells occupied by each player number.
+        occupied (int): A bitmask of every cell that cannot be entered.
+        moves (list): Pairs (move, offset) of each move and its flat offset.
+        offsets (dict): The flat offset of each move.
+        neighbours (list): For each cell, the bitmask of its 4 neighbours,
+         shared by the boards of the same size.
+        black (int): A bitmask of the cells (x, y) with an even x + y, the
+         black cells of a checkerboard.
+    """
+
+    # Up : (0, -1), Down : (0, 1), Right : (1, 0), Left  : (-1, 0)
+    MOVES = [(0, -1), (0, 1), (1, 0), (-1, 0)]
+    # The neighbours and the checkerboard of each board size, computed once,
+    # and the rings of the sizes whose regions are tracked (see rings)
+    TABLES = {}
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        :param width: to define the width of the grid
+        :param height: to define the height of the grid
+        """
+        self.width, self.height = width, height
+        self.full = (1 << (width * height)) - 1
+        self.walls = 0
+        self.trails = {}
+        self.occupied = 0
+        self.moves = [((dx, dy), dx * height + dy) for dx, dy in self.MOVES]
+        self.offsets = dict(self.moves)
+        if (width, height) not in self.TABLES:
+            black = sum(1 << (x * height + y) for x in range(width)
+                        for y in range(height) if (x + y) % 2 == 0)
+            self.TABLES[width, height] = (self.init_neighbours(width, height),
+                                          black)
+        self.neighbours, self.black = self.TABLES[width, height]
+
+    @staticmethod
+    def init_neighbours(width: int, height: int) -> list[int]:
+        """
+        Precompute the bitmask of the neighbours of every cell of the grid
+        :param width: of the grid
+        :param height: of the grid
+        :return: list of bitmasks indexed by the flat index of a cell
+        """
+        neighbours = []
+        for x in range(width):
+            for y in range(height):
+                mask = 0
+                for dx, dy in Board.MOVES:
+                    if 0 <= x + dx < width and 0 <= y + dy < height:
+                        mask |= 1 << ((x + dx) * height + y + dy)
+                neighbours.append(mask)
+
+        return neighbours
+
+    @staticmethod
+    def init_rings(width: int, height: int) -> list[int]:
+        """
+        Precompute the bitmask of the 8 cells around every cell of the grid
+        :param width: of the grid
+        :param height: of the grid
+        :return: list of bitmasks indexed by the flat index of a cell
+        """
+        rings = []
+        for x in range(width):
+            for y in range(height):
+                mask = 0
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        if (dx or dy) and 0 <= x + dx < width \
+                                and 0 <= y + dy < height:
+                            mask |= 1 << ((x + dx) * height + y + dy)
+                rings.append(mask)
+
+        return rings
+
+    def rings(self) -> list[int]:
+        """
+        Get the bitmask of the 8 cells around every cell, computed on first
+        use and shared by the boards of the same size
+        :return: list of bitmasks indexed by the flat index of a cell
+        """
+        key = (self.width, self.height, 'rings')
+        if key not in self.TABLES:
+            self.TABLES[key] = self.init_rings(self.width, self.height)
+
+        return self.TABLES[key]
+
+    @classmethod
+    def from_grid(cls, grid: np.ndarray) -> 'Board':
+        """
+        Build the bitboard from a numpy grid (-1 for walls, 0 for empty cells
+        and the player number for its trail)
+        :param grid: numpy array of the game
+        :return: the matching Board
+        """
+        board = cls(grid.shape[0], grid.shape[1])
+        for index, value in enumerate(grid.flat):
+            if value == -1:
+                board.walls |= 1 << index
+            elif value > 0:
+                board.trails[int(value)] = (board.trails.get(int(value), 0)
+                                            | 1 << index)
+        board.occupied = board.walls
+        for trail in board.trails.values():
+            board.occupied |= trail
+
+        return board
+
+    def index(self, x: int, y: int) -> int:
+        """
+        Get the flat index (bit position) of a cell
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :return: the flat index of the cell
+        """
+        return x * self.height + y
+
+    def is_free(self, x: int, y: int) -> bool:
+        """
+        Check if a cell can be entered
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :return: the truth of "the cell is empty"
+        """
+        return not self.occupied >> (x * self.height + y) & 1
+
+    def occupy(self, x: int, y: int, number: int) -> None:
+        """
+        Mark a cell as part of the trail of a player
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :param number: of the player leaving the trail
+        """
+        bit = 1 << (x * self.height + y)
+        self.trails[number] = self.trails.get(number, 0) | bit
+        self.occupied |= bit
+
+    def release(self, x: int, y: int, number: int) -> None:
+        """
+        Remove a cell from the trail of a player
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :param number: of the player who left the trail
+        """
+        bit = 1 << (x * self.height + y)
+        self.trails[number] &= ~bit
+        self.occupied &= ~bit
+
+    def free(self) -> int:
+        """
+        Get the bitmask of the cells that can still be entered
+        :return: bitmask of the empty cells
+        """
+        return self.full & ~self.occupied
+
+    def flood_fill(self, seed: int, free: int) -> int:
+        """
+        Grow the seed cells through the free cells (bitboard BFS)
+        :param seed: bitmask of the starting cells
+        :param free: bitmask of the cells the fill can go through
+        :return: bitmask of the seed and every cell reached from it
+        """
+        height = self.height
+        region = frontier = seed
+        while frontier:
+            frontier = ((frontier << 1 | frontier >> 1 | frontier << height
+                         | frontier >> height) & free & ~region)
+            region |= frontier
+
+        return region
+
+    def voronoi(self, index_1: int, index_2: int) -> tuple[int, int]:
+        """
+        Grow the empty cells from both positions at the same time (two-source
+        BFS), one distance layer per step. A cell reached by both players on
+        the same step belongs to nobody
+        :param index_1: flat index of the first position
+        :param index_2: flat index of the second position
+        :return: tuple (cells_1, cells_2) of the number of empty cells each
+         position reaches strictly first
+        """
+        height = self.height
+        free = self.full & ~self.occupied
+        frontier_1, frontier_2 = 1 << index_1, 1 << index_2
+        seen = frontier_1 | frontier_2
+        cells_1 = cells_2 = 0
+        while frontier_1 or frontier_2:
+            grown_1 = ((frontier_1 << 1 | frontier_1 >> 1 | frontier_1 << height
+                        | frontier_1 >> height) & free & ~seen)
+            grown_2 = ((frontier_2 << 1 | frontier_2 >> 1 | frontier_2 << height
+                        | frontier_2 >> height) & free & ~seen)
+            seen |= grown_1 | grown_2
+            contested = grown_1 & grown_2
+            cells_1 += (grown_1 & ~contested).bit_count()
+            cells_2 += (grown_2 & ~contested).bit_count()
+            frontier_1, frontier_2 = grown_1, grown_2
+
+        return cells_1, cells_2
+
+    def territories(self, indexes: list[int]) -> list[int]:
+        """
+        Grow the empty cells from many positions at the same time (multi-
+        source BFS), one distance layer per step. A cell reached by several
+        positions on the same step belongs to nobody
+        :param indexes: flat index of each position
+        :return: the number of empty cells each position reaches strictly
+         first
+        """
+        height = self.height
+        free = self.full & ~self.occupied
+        frontiers = [1 << index for index in indexes]
+        seen = 0
+        for frontier in frontiers:
+            seen |= frontier
+        cells = [0] * len(indexes)
+        while any(frontiers):
+            grown = [(frontier << 1 | frontier >> 1 | frontier << height
+                      | frontier >> height) & free & ~seen
+                     for frontier in frontiers]
+            once = twice = 0
+            for cells_grown in grown:
+                twice |= once & cells_grown
+                once |= cells_grown
+            seen |= once
+            for i, cells_grown in enumerate(grown):
+                cells[i] += (cells_grown & ~twice).bit_count()
+            frontiers = grown
+
+        return cells
+
+    def parity_bound(self, index: int, region: int) -> int:
+        """
+        Bound the length of a path with the colors of the checkerboard: the
+        cells of a path alternate colors, starting with the color opposite
+        to the one of the position
+        :param index: flat index of the position
+        :param region: bitmask of the empty cells the path can go through
+        :return: the maximum number of cells of the path
+        """
+        black = (region & self.black).bit_count()
+        white = region.bit_count() - black
+        first, second = (white, black) if self.black >> index & 1 \
+            else (black, white)
+
+        return 2 * second + 1 if first > second else 2 * first
+
+    def fillable(self, index: int, free: int) -> tuple[int, int]:
+        """
+        Bound the number of cells a path from a position can fill, in linear
+        time. A depth-first search (Tarjan) finds the articulation points of
+        the empty cells reachable from the position: they split the region
+        into chambers (its biconnected components). A path can fill the
+        chamber it is in, but then only enter one of the chambers behind an
+        articulation point, as it can never come back. The bound is also
+        limited by the colors of the checkerboard
+        :param index: flat index of the position
+        :param free: bitmask of the empty cells
+        :return: tuple (bound, region) of the maximum number of cells of the
+         path (the position excluded) and the bitmask of the empty cells
+         reachable from the position
+        """
+        # The cells next to the position are linked to it, so that a chamber
+        # the path can enter right from the position is not cut from it
+        neighbours = self.neighbours
+        cells = free | 1 << index
+        discovery, low, parent = {index: 0}, {index: 0}, {}
+        order = [index]
+        stack = [(index, neighbours[index] & free)]
+        while stack:
+            cell, pending = stack[-1]
+            if pending:
+                bit = pending & -pending
+                stack[-1] = (cell, pending ^ bit)
+                other = bit.bit_length() - 1
+                if other in discovery:
+                    low[cell] = min(low[cell], discovery[other])
+                else:
+                    discovery[other] = low[other] = len(order)
+                    order.append(other)
+                    parent[other] = cell
+                    stack.append((other, neighbours[other] & cells))
+            else:
+                stack.pop()
+                if stack:
+                    above = stack[-1][0]
+                    low[above] = min(low[above], low[cell])
+
+        # We go up the tree of the search: a child which cannot reach above
+        # its parent starts a chamber behind it (the position is left for
+        # good, so every child of the position starts a chamber)
+        count = dict.fromkeys(order, 1)
+        count[index] = 0
+        best = dict.fromkeys(order, 0)
+        region = 0
+        for cell in reversed(order[1:]):
+            region |= 1 << cell
+            above = parent[cell]
+            if above == index or low[cell] >= discovery[above]:
+                best[above] = max(best[above], count[cell] + best[cell])
+            else:
+                count[above] += count[cell]
+                best[above] = max(best[above], best[cell])
+
+        return min(best[index], self.parity_bound(index, region)), region
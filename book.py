@@ -0,0 +1,195 @@
+""" Manage all the features related to the opening book of the Tron Game: the
+positions already searched, stored on disk and shared across games """
+
+import hashlib
+import sqlite3
+import numpy as np
+from board import Board
+from player import Player
+
+
+class OpeningBook:
+    """
+    A class for managing the opening book, an SQLite table of the best move
+    and score of the positions searched at a given depth.
+
+    A position is keyed by a canonical hash: the player to move is labelled
+    1 and its opponent 2, and among the symmetries of the board (8 for a
+    square board, 4 otherwise) the one giving the smallest grid is kept, so
+    that symmetric positions share the same entry. The move is stored in the
+    frame of this canonical grid.
+
+    Attributes:
+        path (str): The path of the SQLite database.
+        connection (sqlite3.Connection): The connection to the database.
+        max_turns (int): The positions searched by a game during its first
+         max_turns turns are added to the book, 0 to only read it.
+        hits (int): The number of positions found in the book.
+        misses (int): The number of positions not found in the book.
+    """
+
+    def __init__(self, path: str = 'book.sqlite', max_turns: int = 8) -> None:
+        """
+        :param path: of the SQLite database, created if needed
+        :param max_turns: number of turns of a game whose searches are added
+         to the book
+        """
+        self.path = path
+        # The GUI searches in its worker thread
+        self.connection = sqlite3.connect(path, timeout=30,
+                                          check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS positions '
+                                '(key BLOB PRIMARY KEY, depth INTEGER, '
+                                'score REAL, move INTEGER)')
+        self.connection.commit()
+        self.max_turns = max_turns
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def symmetries(width: int, height: int) -> list[tuple[bool, bool, bool]]:
+        """
+        List the symmetries of the board
+        :param width: of the board
+        :param height: of the board
+        :return: list of (transpose, flip x, flip y), applied in this order
+        """
+        transposes = (False, True) if width == height else (False,)
+
+        return [(transpose, flip_x, flip_y) for transpose in transposes
+                for flip_x in (False, True) for flip_y in (False, True)]
+
+    @staticmethod
+    def variant(evaluator: str, simultaneous: bool) -> str:
+        """
+        Name the variant of the game: the best moves depend on the
+        evaluation and on the simultaneous moves
+        :param evaluator: name of the evaluation of the searches
+        :param simultaneous: both players move at the same time
+        :return: the name of the variant
+        """
+        return f'{evaluator}/{simultaneous}'
+
+    @staticmethod
+    def transform_move(move: tuple[int, int],
+                       symmetry: tuple[bool, bool, bool]) -> tuple[int, int]:
+        """
+        Apply a symmetry of the board to a move
+        :param move: tuple of integers (i, j)
+        :param symmetry: tuple (transpose, flip x, flip y)
+        :return: the move in the transformed board
+        """
+        transpose, flip_x, flip_y = symmetry
+        dx, dy = move
+        if transpose:
+            dx, dy = dy, dx
+
+        return -dx if flip_x else dx, -dy if flip_y else dy
+
+    @classmethod
+    def canonical(cls, grid: np.ndarray, player: Player, opponent: Player,
+                  variant: str) -> tuple[bytes, tuple[bool, bool, bool]]:
+        """
+        Compute the canonical key of the position with a player to move
+        :param grid: numpy array of the game
+        :param player: to move
+        :param opponent: of the player to move
+        :param variant: of the game (see variant)
+        :return: tuple (key, symmetry) of the hash of the canonical grid and
+         the symmetry turning the grid into it
+        """
+        width, height = grid.shape
+        grid = np.where(grid == player.number, 1,
+                        np.where(grid == opponent.number, 2,
+                                 grid)).astype(np.int8)
+        grid[player.x, player.y] = 3
+        grid[opponent.x, opponent.y] = 4
+
+        best = None
+        for symmetry in cls.symmetries(width, height):
+            transpose, flip_x, flip_y = symmetry
+            transformed = grid.T if transpose else grid
+            if flip_x:
+                transformed = transformed[::-1, :]
+            if flip_y:
+                transformed = transformed[:, ::-1]
+            data = np.ascontiguousarray(transformed).tobytes()
+            if best is None or data < best[0]:
+                best = data, symmetry
+
+        prefix = f'{width}x{height}/{variant}/'.encode()
+        key = hashlib.blake2b(prefix + best[0], digest_size=16).digest()
+
+        return key, best[1]
+
+    def probe(self, grid: np.ndarray, player: Player, opponent: Player,
+              variant: str, depth: int = 0) \
+            -> tuple[int, float, tuple[int, int]] | None:
+        """
+        Look for the position with a player to move in the book
+        :param grid: numpy array of the game
+        :param player: to move
+        :param opponent: of the player to move
+        :param variant: of the game (see canonical)
+        :param depth: minimum depth of the search of the entry
+        :return: tuple (depth, score, move) of the entry, or None
+        """
+        key, symmetry = self.canonical(grid, player, opponent, variant)
+        row = self.connection.execute(
+            'SELECT depth, score, move FROM positions WHERE key = ?',
+            (key,)).fetchone()
+        if row is None or row[0] < depth:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        stored = Board.MOVES[row[2]]
+        move = next(move for move in Board.MOVES
+                    if self.transform_move(move, symmetry) == stored)
+
+        return row[0], row[1], move
+
+    @classmethod
+    def entry(cls, grid: np.ndarray, player: Player, opponent: Player,
+              variant: str, depth: int, score: float,
+              move: tuple[int, int]) -> tuple:
+        """
+        Build the row of the book of a position with a player to move
+        :param grid: numpy array of the game
+        :param player: to move
+        :param opponent: of the player to move
+        :param variant: of the game (see canonical)
+        :param depth: of the search
+        :param score: of the best move
+        :param move: best move of the player to move
+        :return: tuple (key, depth, score, index of the canonical move)
+        """
+        key, symmetry = cls.canonical(grid, player, opponent, variant)
+
+        return (key, depth, score,
+                Board.MOVES.index(cls.transform_move(move, symmetry)))
+
+    def store(self, rows: list[tuple]) -> None:
+        """
+        Add entries to the book, keeping the deepest search of a position
+        :param rows: of the book, built by entry
+        """
+        self.connection.executemany(
+            'INSERT INTO positions VALUES (?, ?, ?, ?) ON CONFLICT(key) DO '
+            'UPDATE SET depth = excluded.depth, score = excluded.score, '
+            'move = excluded.move WHERE excluded.depth > positions.depth',
+            rows)
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        """
+        :return: the number of positions of the book
+        """
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Close the connection to the database
+        """
+        self.connection.close()
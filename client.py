@@ -0,0 +1,283 @@
+""" Manage all the features related to the client simulator of the server
+mode of the Tron Game: many concurrent games played through the server, to
+measure its throughput and latency """
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import random
+import time
+import numpy as np
+from game import Game
+from player import Player
+from replay import encode_grid
+from server import TronServer
+from tournament import parse_size, parse_settings
+
+
+class Connection:
+    """
+    A class for managing a connection to the server, whose requests can be
+    sent before the replies of the previous ones are read.
+
+    Attributes:
+        reader (asyncio.StreamReader): The reader of the connection.
+        writer (asyncio.StreamWriter): The writer of the connection.
+        ids (itertools.count): The ids of the next requests.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        """
+        :param reader: of the connection
+        :param writer: of the connection
+        """
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> 'Connection':
+        """
+        Connect to the server
+        :param host: address of the server
+        :param port: of the server
+        :return: the connection
+        """
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def requests(self, messages: list[dict]) -> list[dict]:
+        """
+        Send requests at once, then read their replies
+        :param messages: of the requests
+        :return: the replies, in the order of the requests
+        """
+        ids = []
+        for message in messages:
+            ids.append(next(self.ids))
+            self.writer.write((json.dumps({**message, 'id': ids[-1]})
+                               + '\n').encode())
+        await self.writer.drain()
+        replies = {}
+        while len(replies) < len(ids):
+            reply = json.loads(await self.reader.readline())
+            replies[reply['id']] = reply
+
+        return [replies[request_id] for request_id in ids]
+
+    async def request(self, message: dict) -> dict:
+        """
+        Send a request and read its reply
+        :param message: of the request
+        :return: the reply
+        """
+        return (await self.requests([message]))[0]
+
+    async def close(self) -> None:
+        """
+        Close the connection
+        """
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_remote_game(host: str, port: int, width: int, height: int,
+                           seed: int, settings: dict, simultaneous: bool,
+                           deadline_ms: float,
+                           max_ticks: int | None = None) -> dict:
+    """
+    Play a game whose moves are searched by the server: the simulator
+    keeps the grid, sends it with each request and applies the moves
+    :param host: address of the server
+    :param port: of the server
+    :param width: of the board
+    :param height: of the board
+    :param seed: of the spawns
+    :param settings: search settings of both players
+    :param simultaneous: both players move at the same time
+    :param deadline_ms: deadline of each move request
+    :param max_ticks: maximum number of turns, None to play until the end
+    :return: dict of the record of the game
+    """
+    spawn_1, spawn_2 = Game.spawn_positions(width, height,
+                                            random.Random(seed))
+    player_1 = Player(x=spawn_1[0], y=spawn_1[1], number=1, color='',
+                      wall_color='')
+    player_2 = Player(x=spawn_2[0], y=spawn_2[1], number=2, color='',
+                      wall_color='')
+    # The local game only holds the position, it never searches
+    game = Game(width=width, height=height, player_1=player_1,
+                player_2=player_2, table_mb=0.01, verbose=False)
+    connection = await Connection.open(host, port)
+    session = (await connection.request({
+        'type': 'new', 'width': width, 'height': height,
+        'settings': settings, 'simultaneous': simultaneous}))['session']
+    latencies, errors = [], collections.Counter()
+
+    async def search(players: list[Player]) -> list[tuple[int, int]]:
+        positions = [(player_1.x, player_1.y), (player_2.x, player_2.y)]
+        start = time.perf_counter()
+        replies = await connection.requests([{
+            'type': 'move', 'session': session, 'player': player.number,
+            'grid': encode_grid(game.grid), 'positions': positions,
+            'deadline_ms': deadline_ms} for player in players])
+        latency = time.perf_counter() - start
+        moves = []
+        for player, reply in zip(players, replies):
+            if reply['type'] == 'move':
+                latencies.append(latency)
+                moves.append(tuple(reply['move']))
+            else:
+                # A rejected request still needs a move to go on
+                errors[reply['error']] += 1
+                allowed = game.get_allowed_moves(player)
+                moves.append(allowed[0] if allowed else (0, 0))
+
+        return moves
+
+    while game.winner is None and not (player_1.dead and player_2.dead) \
+            and (max_ticks is None or game.ticks < max_ticks):
+        if simultaneous:
+            move_1, move_2 = await search([player_1, player_2])
+            game.advance_player(player_1, move_1)
+            if not game.advance_player(player_2, move_2) \
+                    and move_2 != (0, 0):
+                player_1.dead = player_2.dead = True
+        else:
+            for player in (player_1, player_2):
+                move, = await search([player])
+                game.advance_player(player, move)
+        game.ticks += 1
+        game.check_alive(player_1)
+        game.check_alive(player_2)
+        game.check_end_game(player_1, player_2)
+
+    await connection.request({'type': 'close', 'session': session})
+    await connection.close()
+
+    return {'size': f'{width}x{height}', 'seed': seed,
+            'result': game.result(), 'ticks': game.ticks,
+            'latencies': latencies, 'errors': dict(errors)}
+
+
+async def simulate(host: str, port: int, sizes: list[tuple[int, int]],
+                   games: int, concurrency: int, settings: dict,
+                   simultaneous: bool, deadline_ms: float,
+                   max_ticks: int | None = None) -> dict:
+    """
+    Play games through the server, concurrency of them at the same time
+    :param host: address of the server
+    :param port: of the server
+    :param sizes: list of (width, height) of the boards
+    :param games: number of games per board size
+    :param concurrency: number of games played at the same time
+    :param settings: search settings of the players
+    :param simultaneous: both players move at the same time
+    :param deadline_ms: deadline of each move request
+    :param max_ticks: maximum number of turns of a game
+    :return: dict of the report (games, moves, errors, throughput and
+     latency percentiles seen by the clients, metrics of the server)
+    """
+    slots = asyncio.Semaphore(concurrency)
+
+    async def play(width: int, height: int, seed: int) -> dict:
+        async with slots:
+            return await play_remote_game(host, port, width, height, seed,
+                                          settings, simultaneous,
+                                          deadline_ms, max_ticks)
+
+    start = time.perf_counter()
+    records = await asyncio.gather(*(
+        play(width, height, seed) for width, height in sizes
+        for seed in range(games)))
+    duration = time.perf_counter() - start
+
+    latencies = np.array([latency for record in records
+                          for latency in record['latencies']])
+    errors = collections.Counter()
+    for record in records:
+        errors.update(record['errors'])
+    connection = await Connection.open(host, port)
+    metrics = await connection.request({'type': 'metrics'})
+    await connection.close()
+
+    report = {'games': len(records), 'moves': len(latencies),
+              'errors': dict(errors), 'duration': duration,
+              'moves_per_sec': len(latencies) / duration,
+              'results': collections.Counter(
+                  record['result'] for record in records),
+              'server': metrics}
+    for percentile in (50, 90, 99):
+        report[f'latency_p{percentile}_ms'] = float(
+            np.percentile(latencies, percentile) * 1000) \
+            if len(latencies) else 0.0
+
+    return report
+
+
+async def simulate_local(processes: int | None, **kwargs) -> dict:
+    """
+    Start a server on a free local port, then simulate the games on it
+    :param processes: number of worker processes of the server
+    :param kwargs: arguments of simulate, but the host and the port
+    :return: dict of the report of simulate
+    """
+    server = TronServer(processes)
+    listener = await server.start('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        async with listener:
+            return await simulate('127.0.0.1', port, **kwargs)
+    finally:
+        server.close()
+
+
+def main() -> None:
+    """
+    Parse the command line and simulate the clients
+    """
+    parser = argparse.ArgumentParser(description='Play Tron games through '
+                                                 'the server and report its '
+                                                 'throughput and latency')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address of the server')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='port of the server')
+    parser.add_argument('--local', action='store_true',
+                        help='start a local server instead of connecting '
+                             'to one')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes of the local server')
+    parser.add_argument('--sizes', nargs='+', default=['16x16'],
+                        help='board sizes, as WIDTHxHEIGHT')
+    parser.add_argument('--games', type=int, default=20,
+                        help='number of games per board size')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='number of games played at the same time')
+    parser.add_argument('--settings', default='time_budget=0.05',
+                        help='search settings of the players, as '
+                             'time_budget=0.05,max_depth=7,evaluator=voronoi')
+    parser.add_argument('--simultaneous', action='store_true',
+                        help='both players move at the same time')
+    parser.add_argument('--deadline-ms', type=float, default=200,
+                        help='deadline of each move request')
+    parser.add_argument('--max-ticks', type=int, default=None,
+                        help='maximum number of turns of a game')
+    args = parser.parse_args()
+
+    kwargs = {'sizes': [parse_size(size) for size in args.sizes],
+              'games': args.games, 'concurrency': args.concurrency,
+              'settings': parse_settings(args.settings),
+              'simultaneous': args.simultaneous,
+              'deadline_ms': args.deadline_ms, 'max_ticks': args.max_ticks}
+    if args.local:
+        report = asyncio.run(simulate_local(args.processes, **kwargs))
+    else:
+        report = asyncio.run(simulate(args.host, args.port, **kwargs))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
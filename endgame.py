@@ -0,0 +1,190 @@
+""" Manage all the features related to the endgame of the Tron Game, once the
+players are separated and each one only has to fill its own region """
+
+import time
+from board import Board
+
+
+class FillTimeout(Exception):
+    """
+    Raised inside the space filling search when its time budget is spent
+    """
+
+
+class SpaceFiller:
+    """
+    A class for managing the space filling search: the longest path a single
+    player can still travel in its region, which is all that matters once the
+    players are walled off from each other.
+
+    The search is a depth-first search memoized on (position, empty cells),
+    where a move is skipped when an upper bound of its path cannot beat the
+    best path found. The bound is the chamber analysis of Board.fillable.
+
+    Attributes:
+        board (Board): The bitboard of the game, for its geometry.
+        neighbours (list): For each cell, the bitmask of its 4 neighbours.
+        moves (list): Pairs (move, offset) of each move and its flat offset.
+        memo (dict): The longest path from each (position, empty cells)
+         already searched.
+        bounds (dict): The (bound, region) of each (position, empty cells)
+         already analysed.
+        max_entries (int): The size of the memo above which it is cleared.
+        max_nodes (int): The number of positions a move searches when it has
+         no time budget (a fixed depth search), to bound it all the same.
+        deadline (float): The time at which the running search must stop,
+         None for no limit.
+        node_limit (int): The number of nodes at which the running search
+         must stop, None for no limit.
+        nodes (int): The number of positions searched.
+    """
+
+    def __init__(self, board: Board, max_entries: int = 200000,
+                 max_nodes: int = 500) -> None:
+        """
+        :param board: bitboard of the game, for its geometry
+        :param max_entries: size of the memo above which it is cleared
+        :param max_nodes: positions searched per move without time budget
+        """
+        self.board = board
+        self.neighbours = board.neighbours
+        self.moves = board.moves
+        self.memo = {}
+        self.bounds = {}
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.deadline = None
+        self.node_limit = None
+        self.nodes = 0
+
+    def chamber_bound(self, index: int, free: int) -> tuple[int, int]:
+        """
+        Bound the length of a path from a position with its chambers (see
+        Board.fillable), remembering the bounds already computed
+        :param index: flat index of the position
+        :param free: bitmask of the empty cells
+        :return: tuple (bound, region) of the maximum number of cells of the
+         path and the bitmask of the empty cells reachable from the position
+        """
+        key = (index, free)
+        if key not in self.bounds:
+            if len(self.bounds) > self.max_entries:
+                self.bounds.clear()
+            self.bounds[key] = self.board.fillable(index, free)
+
+        return self.bounds[key]
+
+    def fill(self, index: int, free: int) -> int:
+        """
+        Search the longest path from a position (memoized depth-first
+        search), trying first the cells with the fewest empty neighbours
+        :param index: flat index of the position
+        :param free: bitmask of the empty cells reachable from the position
+        :return: the number of cells of the longest path
+        """
+        key = (index, free)
+        if key in self.memo:
+            return self.memo[key]
+        self.nodes += 1
+        # A node costs a chamber analysis of the region, far more than a
+        # clock read
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise FillTimeout
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise FillTimeout
+
+        neighbours = self.neighbours
+        bound, _ = self.chamber_bound(index, free)
+        cells = []
+        pending = neighbours[index] & free
+        while pending:
+            bit = pending & -pending
+            pending ^= bit
+            cells.append(bit.bit_length() - 1)
+        cells.sort(key=lambda cell: (neighbours[cell] & free).bit_count())
+
+        best = 0
+        for cell in cells:
+            # The path is already as long as the bound allows
+            if best >= bound:
+                break
+            rest = free & ~(1 << cell)
+            cell_bound, region = self.chamber_bound(cell, rest)
+            if 1 + cell_bound > best:
+                best = max(best, 1 + self.fill(cell, region))
+
+        if len(self.memo) > self.max_entries:
+            self.memo.clear()
+        self.memo[key] = best
+
+        return best
+
+    def greedy(self, index: int, free: int) -> int:
+        """
+        Follow the cells with the fewest empty neighbours until the path is
+        stuck, a quick lower bound of the longest path
+        :param index: flat index of the position
+        :param free: bitmask of the empty cells
+        :return: the number of cells of the path
+        """
+        neighbours = self.neighbours
+        length = 0
+        while neighbours[index] & free:
+            pending = neighbours[index] & free
+            cells = []
+            while pending:
+                bit = pending & -pending
+                pending ^= bit
+                cells.append(bit.bit_length() - 1)
+            index = min(cells, key=lambda cell:
+                        (neighbours[cell] & free).bit_count())
+            free &= ~(1 << index)
+            length += 1
+
+        return length
+
+    def best_move(self, index: int, free: int,
+                  time_budget: float | None = None) \
+            -> tuple[int, tuple[int, int]]:
+        """
+        Choose the move starting the longest path. When the time budget is
+        spent (or max_nodes positions are searched, without time budget),
+        the moves not searched yet are scored by the greedy path
+        :param index: flat index of the position of the player
+        :param free: bitmask of the empty cells
+        :param time_budget: wall-clock time allowed (seconds), None to only
+         search max_nodes positions
+        :return: tuple (length, move) of the path length (exact if the
+         search completed) and its first move, (0, (0, 0)) if stuck
+        """
+        # The scoring of the moves below is part of the budget
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget
+            self.node_limit = None
+        else:
+            self.deadline = None
+            self.node_limit = self.nodes + self.max_nodes
+        candidates = []
+        for move, offset in self.moves:
+            cell = index + offset
+            if free >> cell & 1:
+                rest = free & ~(1 << cell)
+                bound, region = self.chamber_bound(cell, rest)
+                candidates.append((1 + bound, move, cell, region))
+        if not candidates:
+            return 0, (0, 0)
+
+        scores = {move: 1 + self.greedy(cell, region)
+                  for _, move, cell, region in candidates}
+        try:
+            # The most promising moves first, to skip the others
+            for bound, move, cell, region in sorted(candidates, reverse=True):
+                if bound > max(scores.values()):
+                    scores[move] = 1 + self.fill(cell, region)
+        except FillTimeout:
+            pass
+        finally:
+            self.deadline = self.node_limit = None
+        move = max(scores, key=scores.get)
+
+        return scores[move], move
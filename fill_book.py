@@ -0,0 +1,152 @@
+""" Manage all the features related to the offline filling of the opening
+book of the Tron Game """
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from book import OpeningBook
+from game import Game
+from player import Player
+
+
+def search_openings(task: tuple) -> list[tuple]:
+    """
+    Search every position of the first turns of a game from a pair of
+    spawns, expanding every move of both players
+    :param task: tuple (width, height, spawn of player 1, spawn of player 2,
+     depth, turns, evaluator, simultaneous moves)
+    :return: list of rows of the book
+    """
+    (width, height, spawn_1, spawn_2, depth, turns, evaluator,
+     simultaneous) = task
+    player_1 = Player(x=spawn_1[0], y=spawn_1[1], number=1, color='',
+                      wall_color='')
+    player_2 = Player(x=spawn_2[0], y=spawn_2[1], number=2, color='',
+                      wall_color='')
+    game = Game(width=width, height=height, player_1=player_1,
+                player_2=player_2, time_budget=None, max_depth=depth,
+                evaluator=evaluator, verbose=False, simultaneous=simultaneous)
+    rows = {}
+
+    def playable() -> bool:
+        # The book only holds positions the game searches with the minimax
+        return (bool(game.get_allowed_moves(player_1))
+                and bool(game.get_allowed_moves(player_2))
+                and game.is_path_between_players(player_1, player_2))
+
+    def add(player: Player, opponent: Player) -> list[tuple[int, int]]:
+        score, move = game.search(player, opponent)
+        key, *row = OpeningBook.entry(game.grid, player, opponent,
+                                      game.book_variant(),
+                                      game.iterations[-1][0], score, move)
+        rows[key] = row
+
+        return game.get_allowed_moves(player)
+
+    def expand(turn: int) -> None:
+        if turn == turns or not playable():
+            return
+        if simultaneous:
+            moves_1 = add(player_1, player_2)
+            moves_2 = add(player_2, player_1)
+            for move_1 in moves_1:
+                for move_2 in moves_2:
+                    game.make_move(player_1, move_1)
+                    game.make_move(player_2, move_2)
+                    if not (player_1.dead or player_2.dead):
+                        expand(turn + 1)
+                    game.unmake_move()
+                    game.unmake_move()
+            return
+
+        for move_1 in add(player_1, player_2):
+            game.make_move(player_1, move_1)
+            if playable():
+                for move_2 in add(player_2, player_1):
+                    game.make_move(player_2, move_2)
+                    expand(turn + 1)
+                    game.unmake_move()
+            game.unmake_move()
+
+    expand(0)
+
+    return [(key, *row) for key, row in rows.items()]
+
+
+def fill_book(book: OpeningBook, width: int, height: int, depth: int,
+              turns: int, evaluator: str = 'regions',
+              simultaneous: bool = False,
+              processes: int | None = None) -> int:
+    """
+    Fill the book offline with the first turns of every pair of spawns,
+    searched at a fixed depth across a pool of processes
+    :param book: to fill
+    :param width: of the board
+    :param height: of the board
+    :param depth: of the searches
+    :param turns: number of turns searched from the spawns
+    :param evaluator: name of the evaluation of the searches
+    :param simultaneous: both players move at the same time
+    :param processes: number of processes, None for one per core
+    :return: the number of positions added or deepened
+    """
+    # The symmetric pairs of spawns lead to the same positions
+    variant = OpeningBook.variant(evaluator, simultaneous)
+    cells = [(x, y) for x in range(1, width - 1) for y in range(1, height - 1)]
+    tasks = {}
+    for spawn_1 in cells:
+        for spawn_2 in cells:
+            if spawn_1 == spawn_2:
+                continue
+            player_1 = Player(x=spawn_1[0], y=spawn_1[1], number=1, color='',
+                              wall_color='')
+            player_2 = Player(x=spawn_2[0], y=spawn_2[1], number=2, color='',
+                              wall_color='')
+            grid = Game.init_grid(width, height, player_1, player_2)
+            key, _ = OpeningBook.canonical(grid, player_1, player_2, variant)
+            tasks.setdefault(key, (width, height, spawn_1, spawn_2, depth,
+                                   turns, evaluator, simultaneous))
+
+    before = book.connection.total_changes
+    with Pool(processes) as pool:
+        for rows in pool.imap_unordered(search_openings, tasks.values()):
+            book.store(rows)
+
+    return book.connection.total_changes - before
+
+
+def main() -> None:
+    """
+    Parse the command line and fill the book
+    """
+    parser = argparse.ArgumentParser(description='Fill the opening book of '
+                                                 'the Tron Game offline')
+    parser.add_argument('--size', default='8x8',
+                        help='board size, as WIDTHxHEIGHT')
+    parser.add_argument('--depth', type=int, default=8,
+                        help='depth of the searches')
+    parser.add_argument('--turns', type=int, default=2,
+                        help='number of turns searched from the spawns')
+    parser.add_argument('--evaluator', default='regions',
+                        help='evaluation of the searches')
+    parser.add_argument('--simultaneous', action='store_true',
+                        help='both players move at the same time')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='number of processes searching the positions')
+    parser.add_argument('--output', default='book.sqlite',
+                        help='SQLite database of the book')
+    args = parser.parse_args()
+
+    width, height = (int(size) for size in args.size.lower().split('x'))
+    book = OpeningBook(args.output)
+    start = time.perf_counter()
+    changes = fill_book(book, width, height, args.depth, args.turns,
+                        args.evaluator, args.simultaneous, args.processes)
+    print(f'{changes} positions added in {time.perf_counter() - start:.1f}s, '
+          f'{len(book)} in the book')
+    book.close()
+
+
+if __name__ == '__main__':
+    main()
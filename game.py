@@ -1,38 +1,175 @@
 """ Manage all the features related to the Game for the Tron Game """
 
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from queue import Queue
+from board import Board
 from player import Player
+from stats import SearchStats
+from search import SearchableGame
+from tracing import TraceSink, Profiler
+from endgame import SpaceFiller
+from regions import RegionTracker
+from book import OpeningBook
+from mcts import MonteCarloSearch
+from replay import ReplayRecorder
 
 
-class Game:
+class Game(SearchableGame):
     """
     A class for managing the Game of the Tron game.
 
+    The position, the journal of the moves, the transposition table and the
+    move ordering are the ones of SearchableGame.
+
     Attributes:
-        width (int): The width of the game grid.
-        height (int): The height of the game grid.
-        grid (np.ndarray): A numpy array representing the game grid.
         player_1 (Player): The first player of the game.
         player_2 (Player): The second player of the game.
-        winner (int): The id of the winning player, or None if the game is
-         ongoing.
+        evaluator (str): The name of the evaluation used at the leaves of the
+         search ('regions' or 'voronoi').
+        evaluate (callable): The evaluation used at the leaves of the search.
+        table_mb (float): The memory budget of the transposition table.
+        root_moves (list): The moves searched at the root, or None for all
+         the allowed moves.
+        iterations (list): The (depth, score, move) of each completed
+         iteration of the last search.
+        workers (int): The number of processes searching the root moves, 1
+         to search them serially.
+        executor (ProcessPoolExecutor): The pool of the parallel search,
+         created on its first use.
+        evaluators (dict): The evaluations available, by name.
+        engine (str): The name of the search choosing the moves ('minimax'
+         or 'mcts').
+        search_engine (callable): The search choosing the moves.
+        engines (dict): The searches available, by name.
+        trees (dict): For each player number, its Monte Carlo search, whose
+         tree is kept between its moves.
+        recorder (ReplayRecorder): The recorder of the moves of the game, or
+         None.
+        search_settings (dict): The default settings of the search, which a
+         player can override with its own search_settings.
+        verbose (bool): Trace the searches and the moves of the players to
+         the standard output, when no trace sink is given.
+        trace (TraceSink): The JSON-lines trace of the searches, the moves
+         and the end of the game, or None to trace nothing.
+        profiler (Profiler): The profiler run during the searches of the
+         moves, or None.
+        endgame (bool): Once the players are separated, each one fills its
+         own region with the space filling search instead of the minimax,
+         and the minimax evaluates the separated positions as leaves.
+        filler (SpaceFiller): The space filling search of the endgame.
+        regions (RegionTracker): The components of the empty cells, updated
+         at each move to size the regions without flooding them, or None to
+         flood them at each evaluation (faster on the small boards).
+        book (OpeningBook): The positions already searched, consulted before
+         searching, or None.
+        simultaneous (bool): Both players move at the same time: one search
+         tree where each pair of plies is a joint move, and head-on
+         collisions kill both players.
     """
 
+    # The number of cells from which tracking the regions beats flooding
+    # them at each evaluation (slower on 8x8, even on 16x16)
+    TRACK_REGIONS_CELLS = 32 * 32
+    # The root moves keep the order of Board.MOVES, then the principal
+    # variation and the transposition table
+    ORDER_ROOT = False
+
     def __init__(self, width: int, height: int, player_1: Player,
-                 player_2: Player) -> None:
+                 player_2: Player, table_mb: float = 16,
+                 time_budget: float | None = 0.05,
+                 max_depth: int | None = None,
+                 evaluator: str = 'regions', workers: int = 1,
+                 verbose: bool = True, simultaneous: bool = False,
+                 trace: TraceSink | None = None,
+                 profiler: Profiler | None = None,
+                 endgame: bool = True,
+                 book: OpeningBook | None = None,
+                 engine: str = 'minimax',
+                 recorder: ReplayRecorder | None = None,
+                 track_regions: bool | None = None) -> None:
         """
         :param width: to define the width of the grid
         :param height: to define the height of the grid
         :param player_1: play the game as player 1
         :param player_2: play the game as player 2
+        :param table_mb: memory budget of the transposition table (megabytes)
+        :param time_budget: wall-clock time allowed per move (seconds)
+        :param max_depth: deepest iteration of the search
+        :param evaluator: name of the evaluation used at the leaves of the
+         search, 'regions' (separated regions sizes) or 'voronoi' (cells
+         reached first by each player)
+        :param workers: number of processes searching the root moves
+        :param verbose: trace to the standard output if no trace is given
+        :param simultaneous: both players move at the same time
+        :param trace: sink of the JSON-lines trace of the game
+        :param profiler: profiler run during the searches of the moves
+        :param endgame: switch to the space filling search once the players
+         are separated, and stop the minimax at separated positions
+        :param book: opening book consulted before searching, and filled
+         with the searches of the first turns
+        :param engine: name of the search choosing the moves, 'minimax'
+         (iterative deepening alpha-beta) or 'mcts' (Monte Carlo Tree Search,
+         for the large boards)
+        :param recorder: recorder of the moves of the game
+        :param track_regions: keep the components of the empty cells up to
+         date at each move, instead of flooding them at each evaluation,
+         None to track them from TRACK_REGIONS_CELLS cells
         """
-        self.width, self.height = width, height
+        super().__init__(self.init_grid(width, height, player_1, player_2),
+                         [player_1, player_2], table_mb, time_budget,
+                         max_depth)
         self.player_1 = player_1
         self.player_2 = player_2
-        self.grid = self.init_grid(self.width, self.height, player_1, player_2)
-        self.winner = None
+        self.evaluators = {'regions': self.evaluate_board,
+                           'voronoi': self.evaluate_voronoi}
+        self.evaluator = evaluator
+        self.evaluate = self.evaluators[evaluator]
+        self.table_mb = table_mb
+        self.root_moves = None
+        self.iterations = []
+        self.workers = workers
+        self.executor = None
+        self.search_settings = {'time_budget': time_budget,
+                                'max_depth': max_depth,
+                                'evaluator': evaluator,
+                                'engine': engine}
+        self.verbose = verbose
+        self.trace = trace if trace is not None or not verbose \
+            else TraceSink()
+        self.profiler = profiler
+        self.endgame = endgame
+        self.filler = SpaceFiller(self.board)
+        if track_regions is None:
+            track_regions = width * height >= self.TRACK_REGIONS_CELLS
+        self.regions = RegionTracker(self.board) if track_regions else None
+        self.book = book
+        self.simultaneous = simultaneous
+        self.engines = {'minimax': self.search, 'mcts': self.search_mcts}
+        self.engine = engine
+        self.search_engine = self.engines[engine]
+        self.trees = {player.number: MonteCarloSearch(self.board)
+                      for player in (player_1, player_2)}
+        self.recorder = recorder
+
+    @staticmethod
+    def spawn_positions(width: int, height: int, rng: random.Random) \
+            -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        Draw the spawn of both players inside the boundaries, avoiding the
+        same spawn as it will result by an instant draw
+        :param width: of the grid
+        :param height: of the grid
+        :param rng: random generator (seeded to replay the same spawns)
+        :return: tuple of the (x, y) of each player
+        """
+        spawn_1 = spawn_2 = (0, 0)
+        while spawn_1 == spawn_2:
+            spawn_1 = (rng.randrange(1, width - 1), rng.randrange(1, height - 1))
+            spawn_2 = (rng.randrange(1, width - 1), rng.randrange(1, height - 1))
+
+        return spawn_1, spawn_2
 
     @staticmethod
     def init_grid(x: int, y: int, player_1: Player, player_2: Player) -> np.ndarray:
@@ -50,85 +187,129 @@ class Game:
 
         return grid
 
-    @staticmethod
-    def is_path_between_players(grid: np.array, player_1: Player,
-                                player_2: Player) -> bool:
+    def analyse_space(self, player_1: Player, player_2: Player) \
+            -> tuple[bool, int, int]:
         """
-        Check if a path is available between two players through BFS algorithm
-        :param grid: numpy array with obstacles and empty case
+        Flood the empty cells from both players at once on the bitboard (or
+        read their components from the tracked regions), to know if a path
+        is available between them and the size of their region
         :param player_1: of the game
         :param player_2: of the game
-        :return: the truth of "there is a path between the players"
+        :return: tuple (connected, size_1, size_2) where size_i counts the
+         position of the player i and the empty cells it can reach
         """
-        # Initialize visited array to keep track of visited cells
-        visited = np.zeros_like(grid, dtype=bool)
+        board = self.board
+        if self.regions is not None:
+            return self.regions.analyse(board.index(player_1.x, player_1.y),
+                                        board.index(player_2.x, player_2.y))
 
-        def dfs(x: int, y: int):
-            visited[x, y] = True
+        free = board.free()
+        seed_1 = 1 << board.index(player_1.x, player_1.y)
+        index_2 = board.index(player_2.x, player_2.y)
+        region_1 = board.flood_fill(seed_1, free)
+        size_1 = region_1.bit_count()
 
-            if (x, y) == (player_2.x, player_2.y):
-                return True
+        # The players are connected if an empty cell of the region of the
+        # player 1 is a neighbor of the player 2 (its head does not count:
+        # adjacent heads do not share any empty cell through it)
+        connected = bool(region_1 & ~seed_1 & board.neighbours[index_2])
+        # The player 1 may reach components the player 2 does not touch
+        region_2 = board.flood_fill(1 << index_2, free)
 
-            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-                new_x, new_y = x + dx, y + dy
-                if grid[x, y] == 0 and not visited[new_x, new_y]:
-                    dfs(new_x, new_y)
+        return connected, size_1, region_2.bit_count()
 
-            return False
+    def is_path_between_players(self, player_1: Player,
+                                player_2: Player) -> bool:
+        """
+        Check if a path is available between two players
+        :param player_1: of the game
+        :param player_2: of the game
+        :return: the truth of "there is a path between the players"
+        """
+        return self.analyse_space(player_1, player_2)[0]
+
+    def count_fillable_spaces(self, player: Player) -> int:
+        """
+        Bound the number of free spaces a player can really fill: the
+        chokepoints of its region (articulation points) lead to chambers it
+        cannot all visit (see Board.fillable)
+        :param player: of the game
+        :return: int of fillable cases for the player, its position included
+        """
+        bound, _ = self.board.fillable(self.board.index(player.x, player.y),
+                                       self.board.free())
 
-        return dfs(player_1.x, player_1.y)
+        return bound + 1
 
-    @staticmethod
-    def count_free_spaces(grid: np.array, player: Player) -> int:
+    def count_free_spaces(self, player: Player) -> int:
         """
         Count the number of free spaces for a player enclosed
-        :param grid: of the game
         :param player: of the game
         :return: int of free cases for the player
         """
-        # Initialize visited array to keep track of visited cells
-        visited = np.zeros_like(grid, dtype=bool)
-
-        # Initialize a queue for BFS
-        queue = Queue()
-        queue.put((player.x, player.y))
+        if self.regions is not None:
+            return self.regions.region(self.board.index(player.x,
+                                                        player.y))[1] + 1
 
-        free_spaces = 0
+        # Flood the empty cells from the position of the player
+        seed = 1 << self.board.index(player.x, player.y)
+        region = self.board.flood_fill(seed, self.board.free())
 
-        # Perform BFS
-        while not queue.empty():
-            x, y = queue.get()
+        return region.bit_count()
 
-            # If the current cell is already visited, continue to the next cell
-            if visited[x, y]:
-                continue
+    def evaluate_board(self, player_1: Player, player_2: Player) -> int:
+        """
+        Evaluate the board bases on the player_1 (if player 2 loses, points are
+        increasing, while decreasing when player 2 wins)
+        :param player_1: player evaluated
+        :param player_2: player to define the scoring for player_1
+        :return: score_board of the game for player_1
+        """
+        score_board = self.score_outcome(player_1, player_2)
 
-            visited[x, y] = True
+        # We retrieve the number of cases available for each, in one pass
+        connected, player_1_cases, player_2_cases = self.analyse_space(
+            player_1, player_2)
 
-            # Increment the count of free spaces
-            free_spaces += 1
+        # If both players have a wall to separate them
+        if not connected:
+            # Only the cases each one can fill matter
+            player_1_cases = self.count_fillable_spaces(player_1)
+            player_2_cases = self.count_fillable_spaces(player_2)
 
-            # Check adjacent cells
-            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-                new_x, new_y = x + dx, y + dy
-                if ((1 <= new_x < grid.shape[0] - 1 and
-                    1 <= new_y < grid.shape[1] - 1 and
-                    grid[new_x, new_y] == 0) and
-                        not visited[new_x, new_y]):
-                    queue.put((new_x, new_y))
+            # If player_1 has more mobility then he earns points
+            if player_1_cases > player_2_cases:
+                score_board += 25 * player_1_cases
+            elif player_2_cases > player_1_cases:
+                score_board -= 25 * player_2_cases
+            elif player_1_cases == player_2_cases:
+                score_board -= 50
 
-        return free_spaces
+        return score_board
 
-    def evaluate_board(self, grid: np.array, player_1: Player,
-                       player_2: Player) -> int:
+    def evaluate_voronoi(self, player_1: Player, player_2: Player) -> int:
         """
-        Evaluate the board bases on the player_1 (if player 2 loses, points are
-        increasing, while decreasing when player 2 wins)
-        :param grid: board of the game to evaluate
+        Evaluate the board bases on the player_1 with the Voronoi territory:
+        the empty cells each player reaches strictly before the other one
         :param player_1: player evaluated
         :param player_2: player to define the scoring for player_1
         :return: score_board of the game for player_1
         """
+        score_board = self.score_outcome(player_1, player_2)
+
+        territory_1, territory_2 = self.board.voronoi(
+            self.board.index(player_1.x, player_1.y),
+            self.board.index(player_2.x, player_2.y))
+
+        return score_board + 25 * (territory_1 - territory_2)
+
+    def score_outcome(self, player_1: Player, player_2: Player) -> int:
+        """
+        Score the end of the game (if any) for the player_1
+        :param player_1: player evaluated
+        :param player_2: player to define the scoring for player_1
+        :return: score of the outcome of the game for player_1
+        """
         score_board = 0
 
         # If the opponent has won
@@ -147,65 +328,24 @@ class Game:
         if player_1.dead and player_2.dead:
             score_board -= 50
 
-
-        # If both players have a wall to separate them
-        if not self.is_path_between_players(grid, player_1, player_2):
-            # We retrieve the number of cases available for each
-            player_1_cases = self.count_free_spaces(grid, player_1)
-            player_2_cases = self.count_free_spaces(grid, player_2)
-
-            # If player_1 has more mobility then he earns points
-            if player_1_cases > player_2_cases:
-                score_board += 25 * player_1_cases
-            elif player_2_cases > player_1_cases:
-                score_board -= 25 * player_2_cases
-            elif player_1_cases == player_2_cases:
-                score_board -= 50
-
         return score_board
 
-    def get_allowed_moves(self, player: Player) -> list[tuple[int, int]]:
-        """
-        Assign the new allowed moves to the player according to its current
-        position
-        :param player: of the game
-        :return: A tuple of integers (i, j) representing the random move, where:
-                 - i represents the change in position along the x-axis.
-                 - j represents the change in position along the y-axis.
-        """
-        x, y = player.x, player.y
-
-        # Up : (0, -1), Down : (0, 1), Right : (1, 0), Left  : (-1, 0)
-        possible_moves = [(0, -1), (0, 1), (1, 0), (-1, 0)]
-
-        # Check if the coordinates match an empty case
-        allowed_moves = [(dx, dy) for dx, dy in possible_moves
-                         if (1 <= x + dx < self.width and
-                             1 <= y + dy < self.height and
-                             self.grid[x + dx, y + dy] == 0)]
-
-        return allowed_moves
-
     def got_killed_by_other_player(self, player: Player) -> bool:
         """
         Check if the player has been killed by the other player
         :param player: of the game
         :return: the truth of "the player has been killed by the other player"
         """
-        killed_by_other = False
-        allowed_moves = self.get_allowed_moves(player)
-        if len(allowed_moves) != 0:
-            return killed_by_other
-
-        for move in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
-            player.apply_move(move)
-            # If one at least one of the neighbor cell is the other player's wall
-            if self.grid[player.x, player.y] > 0 and self.grid[player.x, player.y] != player.number:
-                killed_by_other = True
-            player.undo_move(move)
+        index = self.board.index(player.x, player.y)
+        neighbours = self.board.neighbours[index]
+        if neighbours & ~self.board.occupied:
+            return False
 
-        return killed_by_other
+        # If at least one of the neighbor cells is the other player's wall
+        others = (self.board.occupied & ~self.board.walls
+                  & ~self.board.trails.get(player.number, 0))
 
+        return neighbours & others != 0
 
     def move_players(self, player_1: Player, player_2: Player) -> None:
         """
@@ -213,26 +353,485 @@ class Game:
         :player_1: a player of the game
         :player_2: a player of the game
         """
+        if self.endgame and not self.is_path_between_players(player_1,
+                                                             player_2):
+            self.move_players_separated(player_1, player_2)
+            return
+        if self.simultaneous:
+            self.move_players_simultaneously(player_1, player_2)
+            return
+
         players = [player_1, player_2]
 
-        for i, player in enumerate(players, start=1):
+        for player in players:
             player_max = player
             player_min = [player for player in players
                           if player != player_max][0]
 
-            _, next_move = self.minimax(depth=7,
-                                        maximizing_player=player_max,
-                                        minimizing_player=player_min,
-                                        alpha=float('-inf'),
-                                        beta=float('inf'),
-                                        maximizing_player_1=True,
-                                        )
+            next_move = self.run_search(player_max, player_min)
+            self.trace_move(player_max, next_move)
+            self.advance_player(player_max, next_move)
 
-            print(f'Player {i} next move :', next_move)
-            print(f'Player {i} current position :', player.x, player.y)
-            player_max.apply_move(next_move)
-            print(f'Player {i} next position :', player.x, player.y)
-            self.grid[player_max.x, player_max.y] = i
+    def move_players_simultaneously(self, player_1: Player,
+                                    player_2: Player) -> None:
+        """
+        Choose the moves of both players on the same position, then apply
+        them at the same time. When both players use the same search
+        settings, a single search gives both moves: the best move of the
+        player 1 and the best reply of the player 2 in the same tree
+        :player_1: a player of the game
+        :player_2: a player of the game
+        """
+        move_1 = self.run_search(player_1, player_2)
+
+        shared = player_1.search_settings == player_2.search_settings
+        if shared and len(self.principal_variation) > 1:
+            move_2 = self.principal_variation[1]
+            self.latencies[player_2.number].append(
+                self.latencies[player_1.number][-1])
+        else:
+            move_2 = self.run_search(player_2, player_1)
+
+        self.trace_move(player_1, move_1)
+        self.trace_move(player_2, move_2)
+        self.advance_player(player_1, move_1)
+        if not self.advance_player(player_2, move_2) and move_2 != (0, 0):
+            # Head-on collision: both players reach the same cell
+            player_1.dead = player_2.dead = True
+
+    def move_players_separated(self, player_1: Player,
+                               player_2: Player) -> None:
+        """
+        Once the players are walled off from each other, they cannot
+        interact anymore: each one plays the move of the longest path in its
+        own region
+        :player_1: a player of the game
+        :player_2: a player of the game
+        """
+        moves = [self.fill_space(player) for player in (player_1, player_2)]
+        for player, move in zip((player_1, player_2), moves):
+            self.trace_move(player, move)
+            self.advance_player(player, move)
+
+    def choose_move(self, player: Player, opponent: Player) \
+            -> tuple[int, int]:
+        """
+        Choose the move of one player on the current position, as
+        move_players does: the space filling search once the players are
+        separated, the search of the player otherwise
+        :param player: to move
+        :param opponent: of the player to move
+        :return: the move chosen for the player
+        """
+        if self.endgame and not self.is_path_between_players(player,
+                                                             opponent):
+            return self.fill_space(player)
+
+        return self.run_search(player, opponent)
+
+    def fill_space(self, player: Player) -> tuple[int, int]:
+        """
+        Search the longest path of a player in its region, within its time
+        budget (or the nodes of SpaceFiller.max_nodes without one), record
+        its latency and trace it
+        :param player: of the game
+        :return: the first move of the longest path found
+        """
+        self.configure_search(player)
+        nodes = self.filler.nodes
+        start = time.perf_counter()
+        length, move = self.filler.best_move(
+            self.board.index(player.x, player.y), self.board.free(),
+            self.time_budget)
+        latency = time.perf_counter() - start
+        self.latencies[player.number].append(latency)
+
+        if self.trace is not None:
+            self.trace.emit('endgame', tick=self.ticks, player=player.number,
+                            length=length, move=move, latency=latency,
+                            nodes=self.filler.nodes - nodes)
+
+        return move
+
+    def run_search(self, player_max: Player, player_min: Player) \
+            -> tuple[int, int]:
+        """
+        Search the move of a player with its own settings, profile the
+        search, record its latency and trace its statistics
+        :param player_max: player to move
+        :param player_min: opponent of the player to move
+        :return: the move found by the search
+        """
+        self.configure_search(player_max)
+        if self.book is not None:
+            move = self.book_move(player_max, player_min)
+            if move is not None:
+                return move
+
+        if self.profiler is not None:
+            self.profiler.start()
+        start = time.perf_counter()
+        try:
+            score, move = self.search_engine(player_max, player_min)
+        finally:
+            latency = time.perf_counter() - start
+            if self.profiler is not None:
+                self.profiler.stop()
+        self.latencies[player_max.number].append(latency)
+
+        if self.trace is not None:
+            self.trace.emit('search', tick=self.ticks,
+                            player=player_max.number,
+                            engine=self.engine, evaluator=self.evaluator,
+                            depth=self.iterations[-1][0]
+                            if self.iterations else 0,
+                            score=score, move=move, latency=latency,
+                            **self.stats.to_dict())
+        if (self.book is not None and self.ticks < self.book.max_turns
+                and self.iterations):
+            self.book.store([OpeningBook.entry(
+                self.grid, player_max, player_min, self.book_variant(),
+                self.iterations[-1][0], score, move)])
+
+        return move
+
+    def book_variant(self) -> str:
+        """
+        Name the variant of the game for the opening book
+        :return: the name of the variant (see OpeningBook.variant)
+        """
+        return OpeningBook.variant(self.evaluator, self.simultaneous)
+
+    def book_move(self, player_max: Player, player_min: Player) \
+            -> tuple[int, int] | None:
+        """
+        Look for the move of a player in the opening book, and record its
+        latency and trace it if found
+        :param player_max: player to move
+        :param player_min: opponent of the player to move
+        :return: the move of the book, or None if the position is not in it
+        """
+        start = time.perf_counter()
+        entry = self.book.probe(self.grid, player_max, player_min,
+                                self.book_variant())
+        if entry is None:
+            return None
+
+        depth, score, move = entry
+        latency = time.perf_counter() - start
+        self.latencies[player_max.number].append(latency)
+        # There is no line to share with the opponent
+        self.principal_variation = []
+        if self.trace is not None:
+            self.trace.emit('book', tick=self.ticks,
+                            player=player_max.number, depth=depth,
+                            score=score, move=move, latency=latency)
+
+        return move
+
+    def load_position(self, grid: np.ndarray, position_1: tuple[int, int],
+                      position_2: tuple[int, int]) -> None:
+        """
+        Put the game in a recorded position (see Replay.seek), to search it
+        again: the bitboard and the hash follow the grid
+        :param grid: numpy array of the game
+        :param position_1: (x, y) of the player 1
+        :param position_2: (x, y) of the player 2
+        """
+        self.grid = grid.copy()
+        board = Board.from_grid(self.grid)
+        # The space filling search and the Monte Carlo trees share the board
+        self.board.walls, self.board.trails = board.walls, board.trails
+        self.board.occupied = board.occupied
+        if self.regions is not None:
+            self.regions.reset()
+        self.player_1.x, self.player_1.y = position_1
+        self.player_2.x, self.player_2.y = position_2
+        self.hash = self.zobrist.hash_board(self.board, [self.player_1,
+                                                         self.player_2])
+
+    def trace_move(self, player: Player, move: tuple[int, int]) -> None:
+        """
+        Trace the move a player is about to play
+        :param player: of the game
+        :param move: chosen for the player
+        """
+        if self.trace is not None:
+            self.trace.emit('move', tick=self.ticks, player=player.number,
+                            position=(player.x, player.y), move=move)
+        if self.recorder is not None:
+            self.recorder.record(player.number, move)
+
+    def configure_search(self, player: Player) -> None:
+        """
+        Use the search settings of the Game, overridden by the ones of the
+        player about to search
+        :param player: of the game
+        """
+        settings = {**self.search_settings, **player.search_settings}
+        self.time_budget = settings['time_budget']
+        self.max_depth = settings['max_depth']
+        self.evaluator = settings['evaluator']
+        self.evaluate = self.evaluators[self.evaluator]
+        self.engine = settings['engine']
+        self.search_engine = self.engines[self.engine]
+
+    def step(self) -> None:
+        """
+        Play one turn without GUI: move both players, then check if the game
+        is over
+        """
+        self.move_players(self.player_1, self.player_2)
+        self.ticks += 1
+        self.check_alive(self.player_1)
+        self.check_alive(self.player_2)
+        self.check_end_game(self.player_1, self.player_2)
+        if self.recorder is not None:
+            self.recorder.end_tick(self.ticks, self.grid,
+                                   [(self.player_1.x, self.player_1.y),
+                                    (self.player_2.x, self.player_2.y)])
+            self.recorder.result = self.result()
+        if self.winner is not None and self.trace is not None:
+            self.trace.emit('game_over', tick=self.ticks,
+                            result=self.result(), nodes=self.nodes)
+
+    def play(self, max_ticks: int | None = None) -> int:
+        """
+        Play the game without GUI until it is over
+        :param max_ticks: maximum number of turns, None to play until the end
+        :return: the result of the game (see result)
+        """
+        while self.winner is None and (max_ticks is None
+                                       or self.ticks < max_ticks):
+            self.step()
+
+        return self.result()
+
+    def result(self) -> int | None:
+        """
+        Get the result of the game
+        :return: the number of the winner, 0 for a draw (both players dead)
+         or None if the game is ongoing
+        """
+        if self.player_1.dead and self.player_2.dead:
+            return 0
+        if self.winner is None:
+            return None
+
+        return self.winner.number
+
+    def search(self, maximizing_player: Player, minimizing_player: Player,
+               root_moves: list[tuple[int, int]] | None = None) \
+            -> tuple[int, tuple[int, int]]:
+        """
+        Run minimax by iterative deepening until the time budget or the max
+        depth is reached, and keep the result of the deepest completed
+        iteration. Each iteration tries the principal variation of the
+        previous one first
+        :param maximizing_player: player to move, whose score is maximized
+        :param minimizing_player: opponent of the maximizing player
+        :param root_moves: moves to search at the root, None for all of them
+        :return: tuple (score, move) of the deepest completed iteration
+        """
+        if self.workers > 1 and root_moves is None:
+            return self.search_parallel(maximizing_player, minimizing_player)
+
+        self.iterations = []
+        # The root entries of a restricted search are only reused by deeper
+        # iterations of the same search, which do not read them
+        self.root_moves = root_moves
+
+        def iteration(depth: int) -> tuple[int, tuple[int, int]]:
+            score, move = self.minimax(depth, maximizing_player,
+                                       minimizing_player, float('-inf'),
+                                       float('inf'), True)
+            self.iterations.append((depth, score, move))
+            return score, move
+
+        # With simultaneous moves, the leaves must end a joint move
+        best = self.deepen(iteration, 2 if self.simultaneous else 1)
+        self.root_moves = None
+
+        return best
+
+    def search_mcts(self, maximizing_player: Player,
+                    minimizing_player: Player) -> tuple[float, tuple[int, int]]:
+        """
+        Run the Monte Carlo Tree Search of the player to move on its time
+        budget, from the tree of its previous searches. With simultaneous
+        moves, the tree lets the player to move play first in each turn: the
+        head-on collisions are not modelled
+        :param maximizing_player: player to move
+        :param minimizing_player: opponent of the player to move
+        :return: tuple (score, move) of the share of the playouts won with
+         the move and the move
+        """
+        start = time.perf_counter()
+        if self.simultaneous:
+            players = [maximizing_player, minimizing_player]
+        else:
+            players = [self.player_1, self.player_2]
+        tree = self.trees[maximizing_player.number]
+        score, move = tree.search(
+            [self.board.index(player.x, player.y) for player in players],
+            players.index(maximizing_player),
+            [player.number for player in players], self.time_budget)
+
+        self.iterations = []
+        self.principal_variation = tree.principal_variation()
+        self.stats = SearchStats()
+        self.stats.nodes = self.stats.leaf_evals = tree.playouts
+        self.stats.duration = time.perf_counter() - start
+
+        return score, move
+
+    def search_parallel(self, maximizing_player: Player,
+                        minimizing_player: Player) \
+            -> tuple[int, tuple[int, int]]:
+        """
+        Split the root moves across the process pool: each worker runs the
+        iterative deepening on one root move. The result is the one of the
+        deepest iteration completed by every worker, with the same move as
+        a cold serial search at this depth. The workers start from empty
+        transposition tables and do not fill the table of this game, so
+        after earlier searches the serial search may break ties otherwise
+        :param maximizing_player: player to move, whose score is maximized
+        :param minimizing_player: opponent of the maximizing player
+        :return: tuple (score, move) of the deepest iteration
+        """
+        start = time.perf_counter()
+        self.principal_variation = []
+        self.iterations = []
+        self.stats = SearchStats()
+        # The game may be over at the root, then there is nothing to split
+        self.check_alive(maximizing_player)
+        self.check_alive(minimizing_player)
+        self.check_end_game(maximizing_player, minimizing_player)
+        if self.winner is not None:
+            return self.evaluate(maximizing_player, minimizing_player), (0, 0)
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.time() + self.time_budget
+        state = self.export_state()
+        moves = self.get_allowed_moves(maximizing_player)
+        entry = self.table.probe(self.position_key(maximizing_player,
+                                                   minimizing_player, True))
+        futures = [self.executor.submit(search_root_move, state,
+                                        maximizing_player.number, move,
+                                        deadline)
+                   for move in moves]
+        scores, lines = {}, {}
+        for move, future in zip(moves, futures):
+            scores[move], lines[move], stats = future.result()
+            self.stats.merge(stats)
+
+        # We replay the root of each iteration as the serial search does: the
+        # best move of the previous iteration first, then the first best score
+        step = 2 if self.simultaneous else 1
+        depths = min(len(move_scores) for move_scores in scores.values())
+        best = None
+        for i in range(depths):
+            ordered = self.order_moves(
+                list(moves), 0, maximizing_player,
+                entry[3] if entry is not None else None) if best is None \
+                else [best[1]] + [move for move in moves if move != best[1]]
+            best_move = max(ordered, key=lambda move: scores[move][i])
+            best = scores[best_move][i], best_move
+            self.iterations.append(((i + 1) * step, best[0], best_move))
+        # The line of the worker is only kept if it stopped at the same depth
+        self.principal_variation = lines[best[1]] \
+            if len(scores[best[1]]) == depths else []
+        self.stats.duration = time.perf_counter() - start
+
+        return best
+
+    def export_state(self) -> tuple:
+        """
+        Serialise the position and the search settings compactly (the trails
+        are bitboards) to send them to another process
+        :return: tuple of the state, to rebuild the Game with from_state
+        """
+        players = [(player.x, player.y, player.number, player.dead)
+                   for player in (self.player_1, self.player_2)]
+
+        return (self.width, self.height, dict(self.board.trails), players,
+                self.table_mb, self.time_budget, self.max_depth,
+                self.evaluator, self.simultaneous, self.endgame)
+
+    @classmethod
+    def from_state(cls, state: tuple) -> 'Game':
+        """
+        Rebuild a Game from the state given by export_state
+        :param state: tuple of the state of a Game
+        :return: the Game in the same position
+        """
+        (width, height, trails, players, table_mb, time_budget, max_depth,
+         evaluator, simultaneous, endgame) = state
+        player_1, player_2 = [Player(x=x, y=y, number=number, color='',
+                                     wall_color='')
+                              for x, y, number, _ in players]
+        player_1.dead, player_2.dead = players[0][3], players[1][3]
+        game = cls(width=width, height=height, player_1=player_1,
+                   player_2=player_2, table_mb=table_mb,
+                   time_budget=time_budget, max_depth=max_depth,
+                   evaluator=evaluator, simultaneous=simultaneous,
+                   verbose=False, endgame=endgame)
+
+        # We write the trails on the grid, then load it: the bitboard shared
+        # by the space filler, the Monte Carlo trees and the regions follows
+        cells = width * height
+        for number, trail in trails.items():
+            bits = np.unpackbits(np.frombuffer(
+                trail.to_bytes((cells + 7) // 8, 'little'), dtype=np.uint8),
+                bitorder='little')[:cells].reshape(width, height)
+            game.grid[bits == 1] = number
+        game.load_position(game.grid, (player_1.x, player_1.y),
+                           (player_2.x, player_2.y))
+
+        return game
+
+    def close(self) -> None:
+        """
+        Shut down the process pool of the parallel search, if any
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def dead_flags(self) -> tuple[bool, bool]:
+        """
+        :return: the dead flags of both players, saved by make_move (without
+         the loop over the players of SearchableGame, as it runs at every
+         node)
+        """
+        return self.player_1.dead, self.player_2.dead
+
+    def set_dead_flags(self, flags: tuple[bool, bool]) -> None:
+        """
+        Restore the dead flags saved by make_move
+        :param flags: dead flags of both players
+        """
+        self.player_1.dead, self.player_2.dead = flags
+
+    def position_key(self, maximizing_player: Player,
+                     minimizing_player: Player,
+                     maximizing_player_1: bool) -> int:
+        """
+        Get the transposition table key of the current position, which also
+        depends on the player to move and on the player maximized
+        :param maximizing_player: player to maximize the score
+        :param minimizing_player: player to minimize the score
+        :param maximizing_player_1: the maximizing player is the one to move
+        :return: the key of the position
+        """
+        to_move = maximizing_player if maximizing_player_1 \
+            else minimizing_player
+
+        return (self.hash ^ self.zobrist.to_move[to_move.number]
+                ^ self.zobrist.perspective[maximizing_player.number])
 
     def check_end_game(self, player_1: Player, player_2: Player) -> None:
         """
@@ -250,7 +849,8 @@ class Game:
         Check if a player is alive (in other terms, the player can still move)
         :param player: of the Game
         """
-        if len(self.get_allowed_moves(player)) == 0:
+        index = self.board.index(player.x, player.y)
+        if not self.board.neighbours[index] & ~self.board.occupied:
             player.dead = True
 
     def minimax(self, depth: int, maximizing_player: Player,
@@ -270,19 +870,50 @@ class Game:
                  - i represents the new position along the x-axis
                  - j represents the new position along the y-axis
         """
-        # We check if the players should be alive or not
-        self.check_alive(maximizing_player)
-        self.check_alive(minimizing_player)
-        # As we use this function recursively, we need to check the end game
-        # condition. It will change 'winner' attribute if the game is over
-        self.check_end_game(maximizing_player, minimizing_player)
+        self.visit()
+
+        # We check if the players should be alive or not (with simultaneous
+        # moves, only once the joint move is complete)
+        if maximizing_player_1 or not self.simultaneous:
+            self.check_alive(maximizing_player)
+            self.check_alive(minimizing_player)
+            # As we use this function recursively, we need to check the end
+            # game condition. It will change 'winner' attribute if the game
+            # is over
+            self.check_end_game(maximizing_player, minimizing_player)
 
         # We define the base case when the max depth is reached/game is over
         if depth == 0 or self.winner is not None:
-            return self.evaluate_board(self.grid, maximizing_player,
-                                       minimizing_player), (0, 0)
+            self.line = []
+            self.stats.leaf_evals += 1
+            return self.evaluate(maximizing_player, minimizing_player), (0, 0)
+
+        # Below the root, once the players are separated (after a complete
+        # round) the outcome only depends on the space each one can fill: the
+        # evaluation is enough and the line is not searched deeper
+        if (self.endgame and maximizing_player_1
+                and len(self.journal) > self.search_root
+                and not self.is_path_between_players(maximizing_player,
+                                                     minimizing_player)):
+            self.line = []
+            self.stats.leaf_evals += 1
+            self.stats.separated_leaves += 1
+            return self.evaluate(maximizing_player, minimizing_player), (0, 0)
+
+        # We look for the position in the transposition table, its score can
+        # be reused if it has been searched at least as deep
+        key = self.position_key(maximizing_player, minimizing_player,
+                                maximizing_player_1)
+        alpha_origin, beta_origin = alpha, beta
+        result, alpha, beta, table_move = self.probe_table(key, depth, alpha,
+                                                           beta)
+        if result is not None:
+            return result
 
         best_move = None
+        best_line = []
+        ply = len(self.journal) - self.search_root
+        self.stats.interior_nodes += 1
 
         # In the case we need to maximize the score of the maximizing_player
         if maximizing_player_1:
@@ -290,12 +921,17 @@ class Game:
             best_score = float('-inf')
 
             # We retrieve all the possible moves
-            possible_moves = self.get_allowed_moves(maximizing_player)
+            possible_moves = self.order_moves(
+                self.get_allowed_moves(maximizing_player), ply,
+                maximizing_player, table_move)
+            if ply == 0 and self.root_moves is not None:
+                possible_moves = [move for move in possible_moves
+                                  if move in self.root_moves]
 
             # We explore the nodes from the current state
-            for move in possible_moves:
+            for i, move in enumerate(possible_moves):
                 # We assign a new position to the maximizing_player
-                maximizing_player.apply_move(move)
+                self.make_move(maximizing_player, move)
 
                 score, _ = self.minimax(depth - 1, maximizing_player,
                                         minimizing_player,
@@ -304,17 +940,19 @@ class Game:
 
                 # We assign the oldest position to the maximizing_player to
                 # explore the other branch
-                maximizing_player.undo_move(move)
+                self.unmake_move()
 
                 # In case the score is superior to the best one we keep it
                 if score > best_score:
                     best_score = score
                     best_move = move
+                    best_line = [move] + self.line
 
                 # Update alpha
                 alpha = max(alpha, score)
                 # Prune the branch if beta <= alpha
                 if beta <= alpha:
+                    self.record_cutoff(maximizing_player, move, i, ply, depth)
                     break
 
         # In the case we need to minimize the score of the minimizing_player
@@ -323,12 +961,20 @@ class Game:
             best_score = float('inf')
 
             # We retrieve all the possible moves
-            possible_moves = self.get_allowed_moves(minimizing_player)
+            possible_moves = self.order_moves(
+                self.get_allowed_moves(minimizing_player), ply,
+                minimizing_player, table_move)
+            # With simultaneous moves, the cell the maximizing_player has just
+            # entered can also be reached: a head-on collision
+            collision = (maximizing_player.x - minimizing_player.x,
+                         maximizing_player.y - minimizing_player.y)
+            if self.simultaneous and collision in Board.MOVES:
+                possible_moves.append(collision)
 
             # We explore the nodes from the current state
-            for move in possible_moves:
+            for i, move in enumerate(possible_moves):
                 # We assign a new position to the minimizing_player
-                minimizing_player.apply_move(move)
+                self.make_move(minimizing_player, move)
 
                 # We generate the score for this new branch
                 score, _ = self.minimax(depth - 1,
@@ -339,17 +985,47 @@ class Game:
 
                 # We assign the oldest position to the minimizing_player to
                 # explore the other branch
-                minimizing_player.undo_move(move)
+                self.unmake_move()
 
                 # In case the score is inferior to the best one we keep it
                 if score < best_score:
                     best_score = score
                     best_move = move
+                    best_line = [move] + self.line
 
                 # Update beta
                 beta = min(beta, score)
                 # Prune the branch if beta <= alpha
                 if beta <= alpha:
+                    self.record_cutoff(minimizing_player, move, i, ply, depth)
                     break
 
+        # We save the result, as a bound if the search has been pruned
+        self.store_table(key, depth, best_score, best_move, alpha_origin,
+                         beta_origin)
+        self.line = best_line
+
         return best_score, best_move
+
+
+def search_root_move(state: tuple, number: int, move: tuple[int, int],
+                     deadline: float | None) \
+        -> tuple[list[int], list[tuple[int, int]], SearchStats]:
+    """
+    Search a single root move in a worker process of the parallel search
+    :param state: of the Game, given by export_state
+    :param number: of the player to move
+    :param move: root move to search
+    :param deadline: wall-clock time (time.time) at which to stop, or None
+    :return: tuple of the score of the move at each completed iteration, the
+     principal variation of the last one and the statistics of the search
+    """
+    game = Game.from_state(state)
+    player, opponent = (game.player_1, game.player_2) if number == 1 \
+        else (game.player_2, game.player_1)
+    if deadline is not None:
+        game.time_budget = max(0.0, deadline - time.time())
+    game.search(player, opponent, root_moves=[move])
+
+    return ([score for _, score, _ in game.iterations],
+            game.principal_variation, game.stats)
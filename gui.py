@@ -1,7 +1,11 @@
 """ Manage all the features related to the Graphical User Interface (GUI) for
 the Tron Game """
 
+import queue
+import threading
+import time
 import tkinter as tk
+import numpy as np
 from game import Game
 
 
@@ -24,13 +28,36 @@ class GUI:
         dict_pages (dict): A dictionary storing pages of the GUI.
         current_page (int): The index of the current page being displayed.
         widget_height (int): The height of the canvas widget in pixels.
+        rendered (np.ndarray): The grid as drawn on the canvas, None before
+         the first frame.
+        heads (dict): The canvas item of the head of each player, by number.
+        info (int): The canvas item of the text displaying the score.
+        render_times (list): The time (seconds) spent drawing each frame.
+        frame_delay (int): The time (milliseconds) between two frames.
+        move_delay (float): The minimum time (seconds) between two moves.
+        moves (queue.Queue): The snapshots of the game posted by the worker
+         thread after each move, read by the Tk event loop.
+        worker (threading.Thread): The thread playing the game (searching the
+         moves), None before the start of the game.
+        stop (threading.Event): Set to ask the worker thread to stop.
+        grid (np.ndarray): The grid of the last snapshot received.
+        positions (dict): The position (x, y) of each player in the last
+         snapshot received, by number.
+        outcome (int): The result of the game in the last snapshot received
+         (see Game.result).
+        thinking_since (float): The time the search of the current move
+         started, None when the game is over.
+        last_latency (float): The time (seconds) spent on the last move.
     """
 
-    def __init__(self, game: Game, pixel_length=20) -> None:
+    def __init__(self, game: Game, pixel_length=20, frame_delay=33,
+                 move_delay=0.1) -> None:
         """
         Initialize the GUI
         :param game: instance of Game class
         :param pixel_length: length of a single pixel
+        :param frame_delay: time (milliseconds) between two frames
+        :param move_delay: minimum time (seconds) between two moves
         """
         self.game = game
         self.pixel_length = pixel_length
@@ -43,6 +70,20 @@ class GUI:
         self.dict_pages = {}
         self.current_page = 0
         self.widget_height = None
+        self.rendered = None
+        self.heads = {}
+        self.info = None
+        self.render_times = []
+        self.frame_delay = frame_delay
+        self.move_delay = move_delay
+        self.moves = queue.Queue()
+        self.worker = None
+        self.stop = threading.Event()
+        self.grid = None
+        self.positions = {}
+        self.outcome = None
+        self.thinking_since = None
+        self.last_latency = None
 
     def create_page(self, id_page: int, frame: tk.Frame) -> tk.Frame:
         """
@@ -86,6 +127,7 @@ class GUI:
         self.canvas = tk.Canvas(frame_0, width=self.width_pixel,
                                 height=self.height_pixel, bg='Black')
         self.canvas.place(x=0, y=0)
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
 
     def draw_case(self, x: int, y: int, color: str) -> None:
         """
@@ -105,53 +147,145 @@ class GUI:
         """
         self.widget_height = self.canvas.winfo_height()
 
+    def case_color(self, value: int) -> str:
+        """
+        Get the color of a case of the grid
+        :param value: of the case in the grid
+        :return: the color to draw the case with
+        """
+        if value == -1:
+            # Wall from the map
+            return 'grey'
+        if value == self.game.player_1.number:
+            # Wall from the player 1
+            return self.game.player_1.wall_color
+        if value == self.game.player_2.number:
+            # Wall from the player 2
+            return self.game.player_2.wall_color
+
+        return 'Black'
+
     def display(self) -> None:
         """
         Display the map with walls (from both map and players) and players
-        motorbike
-        """
-        self.canvas.delete('all')
-
-        # Display the map
-        for x in range(self.width):
-            for y in range(self.height):
-                # Wall from the map
-                if self.game.grid[x, y] == -1:
-                    self.draw_case(x, y, 'grey')
-                # Wall from the player 1
-                elif self.game.grid[x, y] == 1:
-                    self.draw_case(x, y, self.game.player_1.wall_color)
-                # Wall from the player 2
-                elif self.game.grid[x, y] == 2:
-                    self.draw_case(x, y, self.game.player_2.wall_color)
+        motorbike. The walls are drawn once, then only the cases changed
+        since the last frame are added, and the heads are moved
+        """
+        start = time.perf_counter()
+        grid = self.grid
+
+        if self.rendered is None:
+            # First frame: we draw every wall of the map
+            self.canvas.delete('all')
+            changed = np.argwhere(grid != 0)
+            self.rendered = grid.copy()
+        else:
+            mask = grid != self.rendered
+            changed = np.argwhere(mask)
+            self.rendered[mask] = grid[mask]
+        for x, y in changed:
+            self.draw_case(int(x), int(y), self.case_color(grid[x, y]))
 
         # Display both players
-        self.draw_case(self.game.player_1.x, self.game.player_1.y, self.game.player_1.color)
-        self.draw_case(self.game.player_2.x, self.game.player_2.y, self.game.player_2.color)
+        for player in (self.game.player_1, self.game.player_2):
+            x, y = self.positions[player.number]
+            x, y = x * self.pixel_length, y * self.pixel_length
+            corners = (x, y, x + self.pixel_length, y + self.pixel_length)
+            if player.number not in self.heads:
+                self.heads[player.number] = self.canvas.create_rectangle(
+                    *corners, fill=player.color, tags='head')
+            else:
+                self.canvas.coords(self.heads[player.number], *corners)
+        self.canvas.tag_raise('head')
+
+        self.render_times.append(time.perf_counter() - start)
 
     def display_score(self) -> None:
         """
         Display the score of both players
         """
-        if self.game.winner is None:
-            info = 'Playing...'
+        players = {player.number: player
+                   for player in (self.game.player_1, self.game.player_2)}
+        last = '' if self.last_latency is None \
+            else f' (last move {self.last_latency * 1000:.0f} ms)'
+        if self.outcome is None:
+            thinking = time.perf_counter() - self.thinking_since
+            info = f'Thinking... {thinking:.1f}s{last}'
+        elif self.outcome == 0:
+            info = 'Draw'
         else:
-            info = f'The Winner is : Player {self.game.winner.color}'
+            info = f'The Winner is : Player {players[self.outcome].color}'
+
+        color = players[self.outcome].color if self.outcome else 'white'
+        if self.info is None:
+            self.info = self.canvas.create_text(5, 13, anchor='w',
+                                                font='Helvetica 12 bold')
+        self.canvas.itemconfig(self.info, fill=color, text=info)
+        self.canvas.tag_raise(self.info)
+
+    def snapshot(self, latency: float | None = None) -> dict:
+        """
+        Copy the state of the game to display, so that the Tk event loop
+        never reads the grid while the search is playing moves on it
+        :param latency: time (seconds) spent on the last move
+        :return: dict of the grid, the positions, the result and the latency
+        """
+        return {'grid': self.game.grid.copy(),
+                'positions': {player.number: (player.x, player.y) for player
+                              in (self.game.player_1, self.game.player_2)},
+                'outcome': self.game.result(), 'latency': latency}
 
-        self.canvas.create_text(80, 13, font='Helvetica 12 bold', fill=self.game.winner.color if self.game.winner is not None else 'white',
-                                text=info)
+    def run_game(self) -> None:
+        """
+        Play the game in the worker thread, posting a snapshot after each
+        move. The moves are spaced by at least move_delay
+        """
+        while self.game.winner is None and not self.stop.is_set():
+            start = time.perf_counter()
+            self.game.step()
+            latency = time.perf_counter() - start
+            self.moves.put(self.snapshot(latency))
+            self.stop.wait(self.move_delay - latency)
+
+    def start_game(self) -> None:
+        """
+        Start the worker thread playing the game and the frames of the window
+        """
+        self.moves.put(self.snapshot())
+        self.thinking_since = time.perf_counter()
+        self.worker = threading.Thread(target=self.run_game, daemon=True)
+        self.worker.start()
+        self.update_game()
+
+    def close(self) -> None:
+        """
+        Stop the worker thread (after its current move) and close the window
+        """
+        self.stop.set()
+        self.window.destroy()
 
     def update_game(self):
         """
-        Update the window after each move
+        Update the window at a steady frame rate with the last snapshot
+        posted by the worker thread
         """
-        self.display()
-        self.display_score()
-        self.game.move_players(self.game.player_1, self.game.player_2)
-        if self.game.winner is None:
-            self.window.after(100, self.update_game)
-            print("AAAAAAAAA")
-        else:
-            print("BBBBBBBBB")
+        received = False
+        while True:
+            try:
+                snapshot = self.moves.get_nowait()
+            except queue.Empty:
+                break
+            received = True
+            self.grid, self.positions = snapshot['grid'], snapshot['positions']
+            self.outcome = snapshot['outcome']
+            if snapshot['latency'] is not None:
+                self.last_latency = snapshot['latency']
+                self.thinking_since = time.perf_counter()
+
+        if received:
             self.display()
-            self.display_score()
+            if self.game.trace is not None:
+                self.game.trace.emit('frame', render=self.render_times[-1])
+        self.display_score()
+        if self.outcome is None:
+            self.window.after(self.frame_delay, self.update_game)
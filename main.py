@@ -4,34 +4,50 @@ import random
 from gui import GUI
 from game import Game
 from player import Player
+from book import OpeningBook
+from replay import ReplayRecorder
 
 # Define the width and height of the grid
 WIDTH, HEIGHT = 8, 8
 
-# Initialize the (x,y) for each player
-X_PLAYER1, X_PLAYER2 = 0, 0
-Y_PLAYER1, Y_PLAYER2 = 0, 0
+# Both players move at the same time (head-on collisions are draws) instead
+# of one after the other, the rules of the game by default
+SIMULTANEOUS = False
+
+# Draw the seed of the game, recorded in its replay
+SEED = random.randrange(2 ** 32)
 
 # Define the (x,y) for each player inside the boundaries and avoid the same
 # spawn as it will result by an instant draw
-while (X_PLAYER1, Y_PLAYER1) == (X_PLAYER2, Y_PLAYER2):
-    X_PLAYER1, X_PLAYER2 = (random.randrange(1, WIDTH - 1),
-                            random.randrange(1, WIDTH - 1))
-    Y_PLAYER1, Y_PLAYER2 = (random.randrange(1, HEIGHT - 1),
-                            random.randrange(1, HEIGHT - 1))
+(X_PLAYER1, Y_PLAYER1), (X_PLAYER2, Y_PLAYER2) = Game.spawn_positions(
+    WIDTH, HEIGHT, random.Random(SEED))
 
 # Create players
 PLAYER1 = Player(x=X_PLAYER1, y=Y_PLAYER1, number=1, color='red', wall_color='orange')
 PLAYER2 = Player(x=X_PLAYER2, y=Y_PLAYER2, number=2, color='blue', wall_color='cyan')
 
-# Create Game and GUI
-GAME = Game(width=WIDTH, height=HEIGHT, player_1=PLAYER1, player_2=PLAYER2)
+# Create Game (with the positions searched by the previous runs, and
+# recording its moves) and GUI
+BOOK = OpeningBook('book.sqlite')
+RECORDER = ReplayRecorder(Game.init_grid(WIDTH, HEIGHT, PLAYER1, PLAYER2),
+                          [(X_PLAYER1, Y_PLAYER1), (X_PLAYER2, Y_PLAYER2)],
+                          SEED)
+GAME = Game(width=WIDTH, height=HEIGHT, player_1=PLAYER1, player_2=PLAYER2,
+            simultaneous=SIMULTANEOUS, book=BOOK, recorder=RECORDER)
 gui = GUI(GAME)
 
 # Initialize GUI components, start the loop and display it
 gui.init_gui()
-gui.update_game()
+gui.start_game()
 gui.window.mainloop()
 
-# Display the winner
-print(f'The winner is: {GAME.winner.color}')
+# Let the worker thread finish its current move, which is still recorded
+gui.stop.set()
+gui.worker.join()
+
+# Save the replay of the game, even if the window was closed before the end
+RECORDER.save('last_game.replay')
+
+# Display the winner, unless the window was closed before the end
+if GAME.winner is not None:
+    print(f'The winner is: {GAME.winner.color}')
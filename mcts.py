@@ -0,0 +1,323 @@
+""" Manage all the features related to the Monte Carlo Tree Search of the Tron
+Game, an alternative to the minimax for the large boards """
+
+import math
+import random
+import time
+from board import Board
+
+
+class Node:
+    """
+    A class for managing a node of the Monte Carlo tree: the position reached
+    by a move.
+
+    Attributes:
+        move (tuple): The move which led to the node, None if the player
+         could not move.
+        turn (int): The turn (0 or 1) of the player who played the move.
+        cell (int): The flat index of the head of this player after the move.
+        result (float): The reward of the player moving first if the game is
+         over at this node, None otherwise.
+        children (list): The nodes already expanded below this one.
+        untried (list): The (move, cell) not expanded yet, None until the
+         node is first visited.
+        visits (int): The number of playouts through the node.
+        wins (float): The total reward of these playouts for the player who
+         played the move (1 per win, 0.5 per draw).
+    """
+
+    def __init__(self, move: tuple[int, int] | None, turn: int, cell: int,
+                 result: float | None = None) -> None:
+        """
+        :param move: which led to the node
+        :param turn: of the player who played the move
+        :param cell: flat index of the head of this player after the move
+        :param result: reward of the first player if the game is over
+        """
+        self.move = move
+        self.turn = turn
+        self.cell = cell
+        self.result = result
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MonteCarloSearch:
+    """
+    A class for managing the Monte Carlo Tree Search (UCT) of a player.
+
+    The players move in turn, as in Game.move_players: a turn of the game is
+    the move of the first player then the move of the second one, and a
+    player who cannot move at the end of a turn is dead. The playouts run on
+    a compact copy of the position (the bitmask of the occupied cells and
+    the index of both heads), and the tree is kept between the moves of the
+    game: the next search starts from the node of the moves actually played.
+
+    Attributes:
+        board (Board): The bitboard of the game, read at each search.
+        neighbours (list): For each cell, the bitmask of its 4 neighbours.
+        moves (list): Pairs (move, offset) of each move and its flat offset.
+        exploration (float): The exploration constant of the UCT formula.
+        policy (str): The move choice of the playouts, 'random' or
+         'heuristic' (random, but avoiding the dead ends).
+        max_nodes (int): The size of the tree above which it stops growing.
+        max_playouts (int): The number of playouts of a search without time
+         budget.
+        rng (random.Random): The random generator of the playouts.
+        root (Node): The node of the last position searched.
+        root_occupied (int): The bitmask of the occupied cells at the root.
+        size (int): The number of nodes of the tree.
+        reused (int): The number of playouts inherited by the root of the
+         last search from the previous ones.
+        playouts (int): The number of playouts of the last search.
+    """
+
+    POLICIES = ('random', 'heuristic')
+
+    def __init__(self, board: Board, exploration: float = 1.4,
+                 policy: str = 'heuristic', max_nodes: int = 500000,
+                 max_playouts: int = 10000, seed: int | None = None) -> None:
+        """
+        :param board: bitboard of the game
+        :param exploration: constant of the UCT formula
+        :param policy: move choice of the playouts, 'random' or 'heuristic'
+        :param max_nodes: size of the tree above which it stops growing
+        :param max_playouts: number of playouts without time budget
+        :param seed: of the random generator, None for a random seed
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown playout policy {policy!r}, expected '
+                             f'one of {self.POLICIES}')
+        self.board = board
+        self.neighbours = board.neighbours
+        self.moves = board.moves
+        self.exploration = exploration
+        self.policy = policy
+        self.max_nodes = max_nodes
+        self.max_playouts = max_playouts
+        self.rng = random.Random(seed)
+        self.root = None
+        self.root_occupied = 0
+        self.size = 0
+        self.reused = 0
+        self.playouts = 0
+
+    def outcome(self, occupied: int, heads: list[int]) -> float | None:
+        """
+        Check the end of a turn of the game
+        :param occupied: bitmask of the occupied cells
+        :param heads: flat index of the head of each player
+        :return: the reward of the first player (1 win, 0.5 draw, 0 loss),
+         or None if both players can still move
+        """
+        stuck_1 = not self.neighbours[heads[0]] & ~occupied
+        stuck_2 = not self.neighbours[heads[1]] & ~occupied
+        if stuck_1 and stuck_2:
+            return 0.5
+        if stuck_1:
+            return 0.0
+        if stuck_2:
+            return 1.0
+
+        return None
+
+    def expand_moves(self, occupied: int, head: int) \
+            -> list[tuple[tuple[int, int] | None, int]]:
+        """
+        List the moves of a player towards an empty cell
+        :param occupied: bitmask of the occupied cells
+        :param head: flat index of the head of the player
+        :return: list of (move, cell), [(None, head)] if the player cannot
+         move (it waits for the end of the turn)
+        """
+        moves = [(move, head + offset) for move, offset in self.moves
+                 if not occupied >> (head + offset) & 1]
+
+        return moves or [(None, head)]
+
+    def playout(self, occupied: int, heads: list[int], turn: int) -> float:
+        """
+        Play random moves until the end of the game
+        :param occupied: bitmask of the occupied cells
+        :param heads: flat index of the head of each player
+        :param turn: of the player to move
+        :return: the reward of the first player
+        """
+        neighbours = self.neighbours
+        choice = self.rng.choice
+        heuristic = self.policy == 'heuristic'
+        heads = list(heads)
+        while True:
+            if turn == 0:
+                result = self.outcome(occupied, heads)
+                if result is not None:
+                    return result
+            pending = neighbours[heads[turn]] & ~occupied
+            if pending:
+                cells = []
+                while pending:
+                    bit = pending & -pending
+                    pending ^= bit
+                    cells.append(bit.bit_length() - 1)
+                if heuristic and len(cells) > 1:
+                    # A cell without empty neighbour is a dead end
+                    open_cells = [cell for cell in cells
+                                  if neighbours[cell] & ~occupied]
+                    cells = open_cells or cells
+                cell = choice(cells)
+                occupied |= 1 << cell
+                heads[turn] = cell
+            turn = 1 - turn
+
+    def select_child(self, node: Node) -> Node:
+        """
+        Choose the child of a node with the UCT formula
+        :param node: fully expanded
+        :return: the child with the best upper confidence bound
+        """
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+
+        return max(node.children, key=lambda child: (
+            child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits)))
+
+    def iterate(self, occupied: int, heads: list[int]) -> None:
+        """
+        Run one playout: select a path of the tree with UCT, expand one node,
+        play randomly from it and back-propagate the reward
+        :param occupied: bitmask of the occupied cells at the root
+        :param heads: flat index of the head of each player at the root
+        """
+        heads = list(heads)
+        node = self.root
+        path = [node]
+        while node.result is None and node.untried == [] and node.children:
+            node = self.select_child(node)
+            occupied |= 1 << node.cell
+            heads[node.turn] = node.cell
+            path.append(node)
+
+        result = node.result
+        if result is None:
+            turn = 1 - node.turn
+            if node.untried is None:
+                node.untried = self.expand_moves(occupied, heads[turn])
+                self.rng.shuffle(node.untried)
+            if node.untried and self.size < self.max_nodes:
+                move, cell = node.untried.pop()
+                occupied |= 1 << cell
+                heads[turn] = cell
+                child = Node(move, turn, cell, self.outcome(occupied, heads)
+                             if turn == 1 else None)
+                node.children.append(child)
+                self.size += 1
+                node = child
+                path.append(node)
+                result = node.result
+            if result is None:
+                result = self.playout(occupied, heads, 1 - node.turn)
+
+        for visited in path:
+            visited.visits += 1
+            visited.wins += result if visited.turn == 0 else 1 - result
+
+    def reroot(self, occupied: int, heads: list[int], turn: int,
+               trails: list[int]) -> None:
+        """
+        Move the root of the tree down to the current position, following
+        the moves played since the last search, or start a new tree if the
+        position is not in it
+        :param occupied: bitmask of the occupied cells
+        :param heads: flat index of the head of each player
+        :param turn: of the player to move
+        :param trails: bitmask of the trail of each player
+        """
+        node = self.root
+        root_occupied = self.root_occupied
+        while node is not None and root_occupied != occupied:
+            # The cell entered by the move is now in the trail of its player
+            node = next((child for child in node.children
+                         if child.move is not None
+                         and not root_occupied >> child.cell & 1
+                         and trails[child.turn] >> child.cell & 1), None)
+            if node is not None:
+                root_occupied |= 1 << node.cell
+
+        if node is None or node.turn == turn \
+                or root_occupied != occupied:
+            node = Node(None, 1 - turn, heads[1 - turn])
+            self.size = 1
+        elif self.size >= self.max_nodes:
+            # The nodes of the other branches are gone
+            self.size = self.count(node)
+        self.root = node
+        self.root_occupied = occupied
+        self.reused = node.visits
+
+    @staticmethod
+    def count(node: Node) -> int:
+        """
+        Count the nodes of a subtree
+        :param node: root of the subtree
+        :return: the number of nodes
+        """
+        size = 0
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            size += 1
+            pending.extend(node.children)
+
+        return size
+
+    def principal_variation(self) -> list[tuple[int, int]]:
+        """
+        Follow the most visited children from the root
+        :return: the moves of the most visited line
+        """
+        line = []
+        node = self.root
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            line.append(node.move if node.move is not None else (0, 0))
+
+        return line
+
+    def search(self, heads: list[int], turn: int, numbers: list[int],
+               time_budget: float | None = None) \
+            -> tuple[float, tuple[int, int]]:
+        """
+        Run playouts until the time budget is spent, and choose the most
+        visited move of the root
+        :param heads: flat index of the head of each player, the first
+         player of the turn first
+        :param turn: of the player to move
+        :param numbers: of the players, the first player of the turn first
+        :param time_budget: wall-clock time allowed (seconds), None to run
+         max_playouts playouts
+        :return: tuple (score, move) of the share of the playouts won with
+         the move and the move, (0, (0, 0)) if the player cannot move
+        """
+        occupied = self.board.occupied
+        self.reroot(occupied, heads, turn,
+                    [self.board.trails.get(number, 0) for number in numbers])
+        if not self.neighbours[heads[turn]] & ~occupied:
+            return 0, (0, 0)
+
+        deadline = time.perf_counter() + time_budget \
+            if time_budget is not None else None
+        self.playouts = 0
+        # The first playouts always run, to have a move to play
+        while (self.playouts < len(self.moves) or (
+                time.perf_counter() < deadline if deadline is not None
+                else self.playouts < self.max_playouts)):
+            self.iterate(occupied, heads)
+            self.playouts += 1
+
+        best = max(self.root.children, key=lambda child: child.visits)
+
+        return best.wins / best.visits, best.move
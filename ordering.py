@@ -0,0 +1,88 @@
+""" Manage all the features related to the move ordering of the search for
+the Tron Game """
+
+from board import Board
+
+
+class MoveOrdering:
+    """
+    A class for managing the move ordering heuristics of the alpha-beta
+    search: the moves which caused a cutoff are tried first, so that the next
+    cutoffs happen as early as possible.
+
+    Attributes:
+        killers (list): For each ply, the last (up to 2) moves which caused a
+         cutoff at this ply.
+        history (dict): For each player number, the cutoff score of each
+         destination cell (indexed by its flat index).
+        mobility (bool): Break the ties of the history with the number of
+         empty neighbors of the destination cell.
+    """
+
+    KILLERS_PER_PLY = 2
+
+    def __init__(self, cells: int, numbers: list[int],
+                 mobility: bool = True) -> None:
+        """
+        :param cells: number of cells of the grid
+        :param numbers: of the players of the game
+        :param mobility: break the ties with the mobility of the destination
+        """
+        self.killers = []
+        self.history = {number: [0] * cells for number in numbers}
+        self.mobility = mobility
+
+    def order(self, moves: list[tuple[int, int]], ply: int, number: int,
+              index: int, board: Board) -> list[tuple[int, int]]:
+        """
+        Sort the moves by killer moves first, then history score, then
+        mobility of the destination cell
+        :param moves: allowed moves of the player to move
+        :param ply: distance from the root of the search
+        :param number: of the player to move
+        :param index: flat index of the position of the player to move
+        :param board: bitboard of the game
+        :return: the moves in the order to explore them
+        """
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history[number]
+        offsets = board.offsets
+        free = board.full & ~board.occupied
+
+        def key(move: tuple[int, int]) -> tuple[bool, int, int]:
+            destination = index + offsets[move]
+            mobility = (board.neighbours[destination] & free).bit_count() \
+                if self.mobility else 0
+            return move in killers, history[destination], mobility
+
+        return sorted(moves, key=key, reverse=True)
+
+    def record_cutoff(self, move: tuple[int, int], ply: int, depth: int,
+                      number: int, destination: int) -> None:
+        """
+        Remember a move which caused a cutoff as killer of its ply and in the
+        history (deeper cutoffs weigh more)
+        :param move: which caused the cutoff
+        :param ply: distance from the root of the search
+        :param depth: remaining depth below the node of the cutoff
+        :param number: of the player who played the move
+        :param destination: flat index of the cell reached by the move
+        """
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.KILLERS_PER_PLY:]
+        self.history[number][destination] += depth * depth
+
+    def clear(self) -> None:
+        """
+        Forget the killers, which are only relevant for the previous search,
+        and halve the history so that recent cutoffs weigh more
+        """
+        self.killers = []
+        for history in self.history.values():
+            for index, score in enumerate(history):
+                if score:
+                    history[index] = score >> 1
@@ -11,15 +11,23 @@ class Player:
         ai (bool): Indicates whether the player is an AI or not.
         dead (bool): Indicates whether the player is dead or alive.
         score (int): The score of the player, used for decision-making.
+        search_settings (dict): The settings of the Game search overridden
+         for this player ('time_budget', 'max_depth', 'evaluator', 'engine').
     """
 
-    def __init__(self, x: int, y: int, number: int, color: str, wall_color: str, score=0, ai: bool = True):
+    # The search reads and moves the players at every node
+    __slots__ = ('x', 'y', 'ai', 'dead', 'score', 'number', 'color',
+                 'wall_color', 'search_settings')
+
+    def __init__(self, x: int, y: int, number: int, color: str, wall_color: str, score=0, ai: bool = True,
+                 search_settings: dict | None = None):
         """
         Initialize the Player object
         :param x: position of the player in abs
         :param y: position of the player in ord
         :param score: score of the player to make decision
         :param ai: indicates whether the player is an AI or not
+        :param search_settings: settings of the Game search for this player
         """
         self.x = x
         self.y = y
@@ -29,6 +37,7 @@ class Player:
         self.number = number
         self.color = color
         self.wall_color = wall_color
+        self.search_settings = search_settings or {}
 
     def apply_move(self, picked_move: tuple[int, int]) -> None:
         """
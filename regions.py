@@ -0,0 +1,138 @@
+""" Manage all the features related to the regions of the Tron Game: the
+connected components of the empty cells, kept up to date move by move instead
+of flooding the board at every evaluation """
+
+from board import Board
+
+
+class RegionTracker:
+    """
+    A class for managing the connected components of the empty cells of a
+    board, updated as the trails grow and shrink during the search.
+
+    Taking a cell only floods its component when the cell may split it: if
+    the empty neighbours of the cell are connected around it (through the 8
+    cells of its ring), the component only loses the cell. Freeing a cell
+    undoes the last cell taken by the search, by restoring the previous
+    components.
+
+    Attributes:
+        board (Board): The bitboard of the game.
+        rings (list): For each cell, the bitmask of its 8 surrounding cells
+         (see Board.rings).
+        components (list): The (bitmask, size) of each component of the
+         empty cells.
+        history (list): The components before each cell taken by the
+         search, to restore them when the cell is freed.
+        floods (int): The number of components flooded to check a split.
+    """
+
+    def __init__(self, board: Board) -> None:
+        """
+        :param board: bitboard of the game, whose empty cells are tracked
+        """
+        self.board = board
+        self.rings = board.rings()
+        self.components = []
+        self.history = []
+        self.floods = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Compute the components of the empty cells of the board from scratch
+        """
+        free = self.board.free()
+        self.components = []
+        self.history = []
+        while free:
+            region = self.board.flood_fill(free & -free, free)
+            self.components.append((region, region.bit_count()))
+            free &= ~region
+
+    def occupy(self, index: int, undoable: bool = False) -> None:
+        """
+        Remove a cell from its component, splitting the component if the
+        cell was its only link between its parts
+        :param index: flat index of the cell taken
+        :param undoable: the cell will be freed by release (a move of the
+         search), so the components are kept to restore them
+        """
+        bit = 1 << index
+        if undoable:
+            self.history.append(self.components)
+        components = list(self.components)
+        for i, (region, size) in enumerate(components):
+            if region & bit:
+                break
+        else:
+            return
+
+        region &= ~bit
+        around = self.board.neighbours[index] & region
+        del components[i]
+        if around & (around - 1) and not self.connected_around(index, region,
+                                                               around):
+            self.floods += 1
+            while around:
+                part = self.board.flood_fill(around & -around, region)
+                components.append((part, part.bit_count()))
+                around &= ~part
+                region &= ~part
+        elif region:
+            components.append((region, size - 1))
+        self.components = components
+
+    def connected_around(self, index: int, region: int, around: int) -> bool:
+        """
+        Check if the empty neighbours of a cell are connected through the
+        ring of cells around it, so that taking the cell cannot split its
+        component
+        :param index: flat index of the cell taken
+        :param region: bitmask of its component, without the cell
+        :param around: bitmask of its empty neighbours
+        :return: the truth of "the neighbours are connected around the cell"
+        """
+        ring = self.rings[index] & region
+        reached = self.board.flood_fill(around & -around, ring)
+
+        return around & ~reached == 0
+
+    def release(self, index: int) -> None:
+        """
+        Give a cell back, undoing the last occupy (the search frees the
+        cells in the reverse order it takes them)
+        :param index: flat index of the cell freed
+        """
+        self.components = self.history.pop()
+
+    def region(self, index: int) -> tuple[int, int]:
+        """
+        Get the empty cells reachable from a position
+        :param index: flat index of the position
+        :return: tuple (region, size) of the bitmask of the components
+         around the position and their number of cells
+        """
+        neighbours = self.board.neighbours[index]
+        region = size = 0
+        for component, component_size in self.components:
+            if component & neighbours:
+                region |= component
+                size += component_size
+
+        return region, size
+
+    def analyse(self, index_1: int, index_2: int) -> tuple[bool, int, int]:
+        """
+        Tell if two positions share empty cells and count the cells each
+        one reaches, as Game.analyse_space
+        :param index_1: flat index of the position of the player 1
+        :param index_2: flat index of the position of the player 2
+        :return: tuple (connected, size_1, size_2) where size_i counts the
+         position i and the empty cells it can reach
+        """
+        region_1, size_1 = self.region(index_1)
+        # Only the empty cells link the positions, not adjacent heads
+        connected = bool(region_1 & self.board.neighbours[index_2])
+
+        return connected, size_1 + 1, self.region(index_2)[1] + 1
@@ -0,0 +1,301 @@
+""" Manage all the features related to the replays of the Tron Game: the
+record of the moves of a game, stored in a compact binary format, and the
+rebuilding of the grid at any turn """
+
+import struct
+import numpy as np
+from board import Board
+
+# Magic, version, width, height, seed, spawns (x1, y1, x2, y2), keyframe
+# interval, turns, number of keyframes, number of moves of each player and
+# result (-1 if the game is ongoing)
+HEADER = struct.Struct('<4sBHHQ4HHIIIIb')
+# Turn and positions (x1, y1, x2, y2) of a keyframe, followed by its grid
+KEYFRAME = struct.Struct('<I4H')
+MAGIC = b'TRON'
+VERSION = 1
+
+
+def pack_codes(codes: np.ndarray) -> bytes:
+    """
+    Pack values of 2 bits, 4 per byte (the first one in the low bits)
+    :param codes: array of integers between 0 and 3
+    :return: the packed bytes
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    quads = padded.reshape(-1, 4)
+
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4
+            | quads[:, 3] << 6).astype(np.uint8).tobytes()
+
+
+def unpack_codes(data: bytes, count: int) -> np.ndarray:
+    """
+    Unpack values of 2 bits packed by pack_codes
+    :param data: the packed bytes
+    :param count: number of values
+    :return: array of integers between 0 and 3
+    """
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3
+
+    return codes.reshape(-1)[:count]
+
+
+def encode_grid(grid: np.ndarray) -> str:
+    """
+    Encode a grid as text, 2 bits per cell as in the keyframes
+    :param grid: numpy array of the game
+    :return: the hexadecimal of the packed cells
+    """
+    return pack_codes(grid.reshape(-1) & 3).hex()
+
+
+def decode_grid(text: str, width: int, height: int) -> np.ndarray:
+    """
+    Decode a grid encoded by encode_grid
+    :param text: hexadecimal of the packed cells
+    :param width: of the grid
+    :param height: of the grid
+    :return: numpy array of the game
+    """
+    codes = unpack_codes(bytes.fromhex(text), width * height)
+
+    return np.where(codes == 3, -1, codes).astype(np.int8).reshape(width,
+                                                                   height)
+
+
+class Replay:
+    """
+    A class for managing the replay of a game: its spawns, the moves of each
+    player and keyframes of the grid.
+
+    A move takes 2 bits (its index in Board.MOVES) in the stream of its
+    player; a player who cannot move anymore has no move in its stream. A
+    keyframe is the grid every keyframe_interval turns, 2 bits per cell (0
+    empty, 1 and 2 the trails of the players, 3 a wall), so that seeking a
+    turn only replays the moves since the keyframe before it.
+
+    Attributes:
+        width (int): The width of the game grid.
+        height (int): The height of the game grid.
+        seed (int): The seed of the game (spawns and random searches).
+        spawns (list): The (x, y) spawn of each player.
+        keyframe_interval (int): The number of turns between two keyframes.
+        ticks (int): The number of turns of the game.
+        moves (list): For each player, the array of the indexes of its moves
+         in Board.MOVES.
+        keyframes (list): The (turn, positions, grid) of each keyframe, the
+         first one at turn 0.
+        result (int): The result of the game (see Game.result), None if the
+         game was not over.
+    """
+
+    DELTAS = np.array(Board.MOVES, dtype=np.int64)
+
+    def __init__(self, width: int, height: int, seed: int,
+                 spawns: list[tuple[int, int]], keyframe_interval: int,
+                 ticks: int, moves: list[np.ndarray], keyframes: list[tuple],
+                 result: int | None) -> None:
+        """
+        :param width: of the game grid
+        :param height: of the game grid
+        :param seed: of the game
+        :param spawns: (x, y) of each player
+        :param keyframe_interval: number of turns between two keyframes
+        :param ticks: number of turns of the game
+        :param moves: indexes of the moves of each player
+        :param keyframes: (turn, positions, grid) of each keyframe
+        :param result: of the game, None if it was not over
+        """
+        self.width, self.height = width, height
+        self.seed = seed
+        self.spawns = spawns
+        self.keyframe_interval = keyframe_interval
+        self.ticks = ticks
+        self.moves = moves
+        self.keyframes = keyframes
+        self.result = result
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the replay in the binary format
+        :return: the header, the move streams and the keyframes
+        """
+        (x_1, y_1), (x_2, y_2) = self.spawns
+        result = -1 if self.result is None else self.result
+        chunks = [HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                              self.seed, x_1, y_1, x_2, y_2,
+                              self.keyframe_interval, self.ticks,
+                              len(self.keyframes), len(self.moves[0]),
+                              len(self.moves[1]), result)]
+        chunks += [pack_codes(moves) for moves in self.moves]
+        for tick, ((x_1, y_1), (x_2, y_2)), grid in self.keyframes:
+            chunks.append(KEYFRAME.pack(tick, x_1, y_1, x_2, y_2))
+            chunks.append(pack_codes(grid.reshape(-1) & 3))
+
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Replay':
+        """
+        Decode a replay from the binary format
+        :param data: encoded by to_bytes
+        :return: the replay
+        """
+        (magic, version, width, height, seed, x_1, y_1, x_2, y_2, interval,
+         ticks, count, moves_1, moves_2, result) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a replay of the Tron game (version '
+                             f'{VERSION})')
+        offset = HEADER.size
+        moves = []
+        for length in (moves_1, moves_2):
+            size = -(-length // 4)
+            moves.append(unpack_codes(data[offset:offset + size], length))
+            offset += size
+
+        cells = width * height
+        grid_size = -(-cells // 4)
+        keyframes = []
+        for _ in range(count):
+            tick, kx_1, ky_1, kx_2, ky_2 = KEYFRAME.unpack_from(data, offset)
+            offset += KEYFRAME.size
+            codes = unpack_codes(data[offset:offset + grid_size], cells)
+            offset += grid_size
+            # The code 3 is a wall (-1)
+            grid = np.where(codes == 3, -1, codes).astype(np.int8)
+            keyframes.append((tick, [(kx_1, ky_1), (kx_2, ky_2)],
+                              grid.reshape(width, height)))
+
+        return cls(width, height, seed, [(x_1, y_1), (x_2, y_2)], interval,
+                   ticks, moves, keyframes, None if result == -1 else result)
+
+    def save(self, path: str) -> None:
+        """
+        Write the replay to a file
+        :param path: of the file
+        """
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'Replay':
+        """
+        Read a replay from a file
+        :param path: of the file
+        :return: the replay
+        """
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    def seek(self, tick: int) -> tuple[np.ndarray, list[tuple[int, int]]]:
+        """
+        Rebuild the grid at the start of a turn, from the keyframe before it
+        :param tick: number of turns played, between 0 and ticks
+        :return: tuple (grid, positions) of the numpy array of the game and
+         the (x, y) of each player
+        """
+        if not 0 <= tick <= self.ticks:
+            raise ValueError(f'Turn {tick} out of the replay (0 to '
+                             f'{self.ticks})')
+        start, positions, grid = max(
+            (keyframe for keyframe in self.keyframes if keyframe[0] <= tick),
+            key=lambda keyframe: keyframe[0])
+        grid, positions = grid.copy(), list(positions)
+
+        trails = []
+        for number, (moves, (x, y)) in enumerate(zip(self.moves, positions),
+                                                start=1):
+            deltas = self.DELTAS[moves[start:tick]]
+            xs = x + np.cumsum(deltas[:, 0])
+            ys = y + np.cumsum(deltas[:, 1])
+            trails.append((number, xs, ys))
+            if len(deltas):
+                positions[number - 1] = (int(xs[-1]), int(ys[-1]))
+        # A head-on collision leaves the cell to the player 1, who moves
+        # first
+        for number, xs, ys in reversed(trails):
+            grid[xs, ys] = number
+
+        return grid, positions
+
+
+class ReplayRecorder:
+    """
+    A class for managing the recording of a game, fed by the Game at each
+    move and at the end of each turn.
+
+    Attributes:
+        width (int): The width of the game grid.
+        height (int): The height of the game grid.
+        seed (int): The seed of the game (spawns and random searches).
+        spawns (list): The (x, y) spawn of each player.
+        numbers (list): The number of each player.
+        keyframe_interval (int): The number of turns between two keyframes.
+        ticks (int): The number of turns recorded.
+        moves (list): For each player, the indexes of its moves.
+        keyframes (list): The (turn, positions, grid) of each keyframe.
+        result (int): The result of the game, None while it is ongoing.
+    """
+
+    def __init__(self, grid: np.ndarray, spawns: list[tuple[int, int]],
+                 seed: int = 0, keyframe_interval: int = 64) -> None:
+        """
+        :param grid: numpy array of the game at its start
+        :param spawns: (x, y) of each player, the player 1 first
+        :param seed: of the game
+        :param keyframe_interval: number of turns between two keyframes
+        """
+        self.width, self.height = grid.shape
+        self.seed = seed
+        self.spawns = [tuple(spawn) for spawn in spawns]
+        self.numbers = [int(grid[x, y]) for x, y in self.spawns]
+        self.keyframe_interval = keyframe_interval
+        self.ticks = 0
+        self.moves = [[] for _ in spawns]
+        self.keyframes = [(0, list(self.spawns), grid.copy())]
+        self.result = None
+
+    def record(self, number: int, move: tuple[int, int]) -> None:
+        """
+        Record the move of a player
+        :param number: of the player
+        :param move: tuple of integers (i, j), (0, 0) if the player cannot
+         move
+        """
+        if move in Board.MOVES:
+            self.moves[self.numbers.index(number)].append(
+                Board.MOVES.index(move))
+
+    def end_tick(self, ticks: int, grid: np.ndarray,
+                 positions: list[tuple[int, int]]) -> None:
+        """
+        Record the end of a turn, and a keyframe every keyframe_interval
+        turns
+        :param ticks: number of turns played
+        :param grid: numpy array of the game
+        :param positions: (x, y) of each player
+        """
+        self.ticks = ticks
+        if ticks % self.keyframe_interval == 0:
+            self.keyframes.append((ticks, list(positions), grid.copy()))
+
+    def replay(self) -> Replay:
+        """
+        :return: the replay of the game recorded so far
+        """
+        return Replay(self.width, self.height, self.seed, self.spawns,
+                      self.keyframe_interval, self.ticks,
+                      [np.array(moves, dtype=np.uint8)
+                       for moves in self.moves],
+                      self.keyframes, self.result)
+
+    def save(self, path: str) -> None:
+        """
+        Write the replay of the game recorded so far to a file
+        :param path: of the file
+        """
+        self.replay().save(path)
@@ -0,0 +1,380 @@
+""" Manage all the features shared by the searches of the Tron Game: the moves
+made and undone through a journal, the transposition table, the move ordering
+and the iterative deepening, for the two player Game and the Arena """
+
+import time
+from typing import Callable
+import numpy as np
+from board import Board
+from player import Player
+from transposition import Zobrist, TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrdering
+from stats import SearchStats
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when the time budget of the current move is spent
+    """
+
+
+class SearchableGame:
+    """
+    A class for managing the position of a Tron game and the machinery of its
+    alpha-beta searches, shared by the Game and the Arena.
+
+    Attributes:
+        width (int): The width of the game grid.
+        height (int): The height of the game grid.
+        grid (np.ndarray): A numpy array representing the game grid.
+        board (Board): The bitboard of the grid, used by the search.
+        players (list): The players of the game, in the order they move.
+        winner (Player): The winning player, or None if the game is ongoing.
+        journal (list): The stack of moves made by the search, used to undo
+         them (player, move, dead flags, winner and hash before the move,
+         and if the move took a cell).
+        nodes (int): The number of nodes visited by the searches.
+        zobrist (Zobrist): The random keys used to hash the positions.
+        hash (int): The Zobrist key of the trails and heads of the players.
+        table (TranspositionTable): The positions already searched.
+        time_budget (float): The wall-clock time allowed per move (seconds),
+         or None to only stop at max_depth.
+        max_depth (int): The deepest iteration of the search, or None to go
+         as deep as the number of empty cells.
+        deadline (float): The time at which the running search must stop.
+        search_root (int): The length of the journal at the root of the
+         running search.
+        principal_variation (list): The best line of the last completed
+         iteration, tried first by the next one.
+        line (list): The best line found below the last node searched.
+        ordering (MoveOrdering): The killer moves and history of the search.
+        stats (SearchStats): The statistics of the last search.
+        regions (RegionTracker): The components of the empty cells, kept up
+         to date by occupy and release, or None.
+        ticks (int): The number of turns played.
+        latencies (dict): For each player number, the time (seconds) spent
+         searching each of its moves.
+    """
+
+    # The killer moves, history and mobility also order the root moves
+    ORDER_ROOT = True
+
+    def __init__(self, grid: np.ndarray, players: list[Player],
+                 table_mb: float, time_budget: float | None,
+                 max_depth: int | None) -> None:
+        """
+        :param grid: numpy array of the game at its start
+        :param players: of the game, in the order they move
+        :param table_mb: memory budget of the transposition table (megabytes)
+        :param time_budget: wall-clock time allowed per move (seconds)
+        :param max_depth: deepest iteration of the search
+        """
+        self.width, self.height = grid.shape
+        self.grid = grid
+        self.board = Board.from_grid(grid)
+        self.players = players
+        self.winner = None
+        self.journal = []
+        self.nodes = 0
+        numbers = [player.number for player in players]
+        self.zobrist = Zobrist(self.width * self.height, numbers)
+        self.hash = self.zobrist.hash_board(self.board, players)
+        self.table = TranspositionTable(table_mb)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.deadline = None
+        self.search_root = 0
+        self.principal_variation = []
+        self.line = []
+        self.ordering = MoveOrdering(self.width * self.height, numbers)
+        self.stats = SearchStats()
+        self.regions = None
+        self.ticks = 0
+        self.latencies = {number: [] for number in numbers}
+
+    def get_allowed_moves(self, player: Player) -> list[tuple[int, int]]:
+        """
+        Get the moves of a player towards an empty cell
+        :param player: of the game
+        :return: list of the allowed moves (i, j)
+        """
+        index = self.board.index(player.x, player.y)
+        occupied = self.board.occupied
+
+        return [move for move, offset in self.board.moves
+                if not occupied >> (index + offset) & 1]
+
+    def occupy(self, x: int, y: int, number: int,
+               undoable: bool = False) -> None:
+        """
+        Mark a cell as part of the trail of a player, on both the grid and
+        the bitboard
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :param number: of the player leaving the trail
+        :param undoable: the cell will be freed by release (a move of the
+         search)
+        """
+        self.grid[x, y] = number
+        self.board.occupy(x, y, number)
+        if self.regions is not None:
+            self.regions.occupy(self.board.index(x, y), undoable)
+
+    def release(self, x: int, y: int, number: int) -> None:
+        """
+        Remove a cell from the trail of a player, on both the grid and the
+        bitboard
+        :param x: abs position of the cell
+        :param y: ord position of the cell
+        :param number: of the player who left the trail
+        """
+        self.grid[x, y] = 0
+        self.board.release(x, y, number)
+        if self.regions is not None:
+            self.regions.release(self.board.index(x, y))
+
+    def advance_player(self, player: Player, move: tuple[int, int],
+                       undoable: bool = False) -> bool:
+        """
+        Move a player and mark its new position as part of its trail
+        :param player: of the game
+        :param move: tuple of integers (i, j) representing the move
+        :param undoable: the move will be undone by unmake_move
+        :return: the truth of "the new position was empty" (a dead player
+         stays on its cell, and a head-on collision reaches a taken cell)
+        """
+        heads = self.zobrist.heads[player.number]
+        self.hash ^= heads[self.board.index(player.x, player.y)]
+        player.apply_move(move)
+        index = self.board.index(player.x, player.y)
+        self.hash ^= heads[index]
+        if not self.board.is_free(player.x, player.y):
+            return False
+        self.hash ^= self.zobrist.cells[player.number][index]
+        self.occupy(player.x, player.y, player.number, undoable)
+
+        return True
+
+    def kill(self, player: Player) -> None:
+        """
+        Mark a player as dead: its head is no longer part of the position
+        :param player: of the game
+        """
+        player.dead = True
+        self.hash ^= self.zobrist.heads[player.number][
+            self.board.index(player.x, player.y)]
+
+    def dead_flags(self) -> list[bool]:
+        """
+        :return: the dead flag of each player, saved by make_move
+        """
+        return [player.dead for player in self.players]
+
+    def set_dead_flags(self, flags: list[bool]) -> None:
+        """
+        Restore the dead flags saved by make_move
+        :param flags: dead flag of each player
+        """
+        for player, dead in zip(self.players, flags):
+            player.dead = dead
+
+    def make_move(self, player: Player, move: tuple[int, int] | None) -> None:
+        """
+        Apply a move during the search and record it in the journal, so it
+        can be undone by unmake_move without copying the grid
+        :param player: of the game
+        :param move: tuple of integers (i, j) representing the move, None if
+         the player cannot move and dies
+        """
+        entry = [player, move, self.dead_flags(), self.winner, self.hash,
+                 True]
+        self.journal.append(entry)
+        if move is None:
+            entry[5] = False
+            self.kill(player)
+        elif not self.advance_player(player, move, undoable=True):
+            # Head-on collision (simultaneous moves): the players on the
+            # cell die
+            entry[5] = False
+            for other in self.players:
+                if other.x == player.x and other.y == player.y:
+                    other.dead = True
+
+    def unmake_move(self) -> None:
+        """
+        Undo the last move of the journal: free the trail cell, move the
+        player back and restore the dead flags, the winner and the hash
+        """
+        player, move, dead, winner, key, taken = self.journal.pop()
+        if taken:
+            self.release(player.x, player.y, player.number)
+        if move is not None:
+            player.undo_move(move)
+        self.set_dead_flags(dead)
+        self.winner = winner
+        self.hash = key
+
+    def visit(self) -> None:
+        """
+        Count a node of the search, and regularly check if the time budget
+        of the move is spent
+        """
+        self.nodes += 1
+        self.stats.nodes += 1
+        if (self.deadline is not None and self.nodes & 15 == 0
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout
+
+    def order_moves(self, moves: list[tuple[int, int]], ply: int,
+                    player: Player, table_move: tuple[int, int] | None = None) \
+            -> list[tuple[int, int]]:
+        """
+        Sort the moves to explore the most likely best first: the move of the
+        transposition table, the move of the principal variation of the
+        previous iteration at this ply, then the killer moves, the history
+        and the mobility (at the root only if ORDER_ROOT)
+        :param moves: allowed moves of the player to move
+        :param ply: distance from the root of the search
+        :param player: to move
+        :param table_move: best move stored in the transposition table
+        :return: the moves in the order to explore them
+        """
+        if ply > 0 or self.ORDER_ROOT:
+            moves = self.ordering.order(moves, ply, player.number,
+                                        self.board.index(player.x, player.y),
+                                        self.board)
+        pv_move = self.principal_variation[ply] \
+            if ply < len(self.principal_variation) else None
+        for first_move in (pv_move, table_move):
+            if first_move in moves and moves[0] != first_move:
+                moves.remove(first_move)
+                moves.insert(0, first_move)
+
+        return moves
+
+    def record_cutoff(self, player: Player, move: tuple[int, int], i: int,
+                      ply: int, depth: int) -> None:
+        """
+        Count a cutoff and remember its move for the move ordering
+        :param player: who played the move
+        :param move: which caused the cutoff
+        :param i: rank of the move among the moves explored
+        :param ply: distance from the root of the search
+        :param depth: remaining depth below the node of the cutoff
+        """
+        self.stats.cutoffs += 1
+        if i == 0:
+            self.stats.first_move_cutoffs += 1
+        destination = self.board.index(player.x + move[0], player.y + move[1])
+        self.ordering.record_cutoff(move, ply, depth, player.number,
+                                    destination)
+
+    def probe_table(self, key: int, depth: int, alpha: float, beta: float) \
+            -> tuple[tuple | None, float, float, tuple[int, int] | None]:
+        """
+        Look for a position in the transposition table, its score can be
+        reused if it has been searched at least as deep
+        :param key: of the position (see Zobrist)
+        :param depth: remaining depth of the node
+        :param alpha: the best score for the maximizing player
+        :param beta: the best score for the minimizing player
+        :return: tuple (result, alpha, beta, table_move) where result is the
+         (score, move) of the entry if it decides the node, else None, alpha
+         and beta are narrowed by the bound of the entry, and table_move is
+         the best move of the entry to try first
+        """
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, alpha, beta, None
+
+        self.stats.table_hits += 1
+        entry_depth, entry_score, bound, entry_move = entry
+        if entry_depth >= depth:
+            if bound == EXACT or (bound == LOWER and entry_score >= beta) or \
+                    (bound == UPPER and entry_score <= alpha):
+                self.stats.table_cutoffs += 1
+                self.line = [entry_move]
+                return (entry_score, entry_move), alpha, beta, entry_move
+            if bound == LOWER:
+                alpha = max(alpha, entry_score)
+            else:
+                beta = min(beta, entry_score)
+
+        return None, alpha, beta, entry_move
+
+    def store_table(self, key: int, depth: int, score: float,
+                    move: tuple[int, int], alpha_origin: float,
+                    beta_origin: float) -> None:
+        """
+        Save the result of a node, as a bound if the search has been pruned
+        :param key: of the position (see Zobrist)
+        :param depth: remaining depth of the node
+        :param score: best score of the node
+        :param move: best move of the node
+        :param alpha_origin: alpha when the node was entered
+        :param beta_origin: beta when the node was entered
+        """
+        if score <= alpha_origin:
+            bound = UPPER
+        elif score >= beta_origin:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, score, bound, move)
+
+    def deepen(self, iteration: Callable[[int], tuple[float, tuple[int, int]]],
+               step: int = 1) -> tuple[float, tuple[int, int]] | None:
+        """
+        Run the iterations of a search by iterative deepening until the time
+        budget or the max depth is reached, and keep the result of the
+        deepest completed iteration. Each iteration tries the principal
+        variation of the previous one first
+        :param iteration: search of the root at a depth, giving the tuple
+         (score, move) of its best move
+        :param step: plies between two iterations
+        :return: tuple (score, move) of the deepest completed iteration
+        """
+        start = time.perf_counter()
+        self.search_root = len(self.journal)
+        self.principal_variation = []
+        self.stats = SearchStats()
+        self.ordering.clear()
+        max_depth = self.max_depth
+        if max_depth is None:
+            max_depth = self.board.free().bit_count() + 1
+
+        best = None
+        for depth in range(step, max(max_depth, step) + 1, step):
+            nodes = self.stats.nodes
+            iteration_start = time.perf_counter()
+            try:
+                score, move = iteration(depth)
+            except SearchTimeout:
+                # We undo the moves of the interrupted iteration
+                while len(self.journal) > self.search_root:
+                    self.unmake_move()
+                break
+            finally:
+                self.deadline = None
+            best = score, move
+            self.stats.nodes_per_depth[depth] = self.stats.nodes - nodes
+            self.stats.time_per_depth[depth] = (time.perf_counter()
+                                                - iteration_start)
+            self.principal_variation = self.line
+
+            # The game is over at the root, there is nothing to search
+            if self.winner is not None:
+                break
+            if self.time_budget is None:
+                continue
+            # We do not start an iteration that would likely not finish
+            elapsed = time.perf_counter() - start
+            if elapsed > self.time_budget / 2:
+                break
+            # The first iteration always completes, the next ones can stop
+            self.deadline = start + self.time_budget
+        # The last iteration may be reached with the deadline still set
+        self.deadline = None
+        self.stats.duration = time.perf_counter() - start
+
+        return best
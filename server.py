@@ -0,0 +1,510 @@
+""" Manage all the features related to the server mode of the Tron Game: the
+moves of many concurrent games searched for remote match runners, over a
+line-delimited JSON protocol """
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from game import Game
+from player import Player
+from replay import decode_grid
+
+# The games of a worker process, by board size, variant and settings: their
+# transposition tables are reused from one request to the next
+GAMES = collections.OrderedDict()
+MAX_GAMES = 8
+# Share of the time left before the deadline given to the search, the rest
+# covers the dispatch to the worker and the reply
+SEARCH_SHARE = 0.8
+# The search settings a session can set
+SETTINGS = ('time_budget', 'max_depth', 'evaluator', 'engine')
+# Largest side of a board: the neighbour masks of a board size grow with the
+# square of its cells, and each worker keeps them for every size it searched
+MAX_SIDE = 128
+
+
+def worker_game(width: int, height: int, simultaneous: bool,
+                settings: dict, table_mb: float) -> Game:
+    """
+    Get the game of the worker process searching the positions of a board
+    size, variant and settings, created on its first use
+    :param width: of the board
+    :param height: of the board
+    :param simultaneous: both players move at the same time
+    :param settings: search settings of the session
+    :param table_mb: memory budget of the transposition table (megabytes)
+    :return: the game, on any position
+    """
+    key = (width, height, simultaneous, json.dumps(settings, sort_keys=True))
+    if key in GAMES:
+        GAMES.move_to_end(key)
+        return GAMES[key]
+
+    player_1 = Player(x=1, y=1, number=1, color='', wall_color='')
+    player_2 = Player(x=1, y=2, number=2, color='', wall_color='')
+    game = Game(width=width, height=height, player_1=player_1,
+                player_2=player_2, table_mb=table_mb, verbose=False,
+                simultaneous=simultaneous)
+    GAMES[key] = game
+    if len(GAMES) > MAX_GAMES:
+        GAMES.popitem(last=False)
+
+    return game
+
+
+def search_position(task: tuple) -> dict:
+    """
+    Choose the move of a player on a position sent by a client (run in a
+    worker process)
+    :param task: tuple (width, height, simultaneous moves, search settings,
+     table megabytes, encoded grid, positions of both players, number of the
+     player to move, time budget)
+    :return: dict of the move, the search time and the nodes searched
+    """
+    (width, height, simultaneous, settings, table_mb, grid, positions,
+     number, time_budget) = task
+    game = worker_game(width, height, simultaneous, settings, table_mb)
+    game.load_position(decode_grid(grid, width, height), *positions)
+    game.player_1.dead = game.player_2.dead = False
+    game.winner = None
+    player, opponent = (game.player_1, game.player_2) if number == 1 \
+        else (game.player_2, game.player_1)
+    player.search_settings = {**settings, 'time_budget': time_budget}
+
+    nodes = game.nodes
+    start = time.perf_counter()
+    move = game.choose_move(player, opponent)
+
+    return {'move': move, 'search_ms': (time.perf_counter() - start) * 1000,
+            'nodes': game.nodes - nodes}
+
+
+class ServerMetrics:
+    """
+    A class for managing the metrics of the server.
+
+    Attributes:
+        start (float): The time the server started.
+        requests (int): The number of requests answered.
+        moves (int): The number of moves searched.
+        nodes (int): The number of nodes searched.
+        errors (collections.Counter): The number of errors, by kind.
+        queued (int): The number of move requests waiting for a worker.
+        in_flight (int): The number of searches running in the workers.
+        latencies (collections.deque): The time (seconds) between the
+         receipt and the reply of the last move requests.
+        search_latencies (collections.deque): The time (seconds) spent
+         searching the last moves, in the workers.
+        completions (collections.deque): The time of the reply of the last
+         move requests.
+        window (float): The time (seconds) of the recent throughput.
+    """
+
+    def __init__(self, history: int = 10000, window: float = 10.0) -> None:
+        """
+        :param history: number of move requests kept for the percentiles
+        :param window: time (seconds) of the recent throughput
+        """
+        self.start = time.perf_counter()
+        self.requests = 0
+        self.moves = 0
+        self.nodes = 0
+        self.errors = collections.Counter()
+        self.queued = 0
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=history)
+        self.search_latencies = collections.deque(maxlen=history)
+        self.completions = collections.deque(maxlen=history)
+        self.window = window
+
+    def record_move(self, latency: float, search_latency: float,
+                    nodes: int) -> None:
+        """
+        Record a move searched
+        :param latency: time (seconds) between the receipt and the reply
+        :param search_latency: time (seconds) spent searching
+        :param nodes: number of nodes searched
+        """
+        self.moves += 1
+        self.nodes += nodes
+        self.latencies.append(latency)
+        self.search_latencies.append(search_latency)
+        self.completions.append(time.perf_counter())
+
+    def snapshot(self, sessions: int) -> dict:
+        """
+        Get the metrics as a JSON serialisable dict
+        :param sessions: number of sessions open
+        :return: dict of the counters, the throughput (overall and over the
+         window) and the latency percentiles (milliseconds)
+        """
+        now = time.perf_counter()
+        uptime = now - self.start
+        recent = sum(completion > now - self.window
+                     for completion in self.completions)
+        metrics = {'uptime': uptime, 'sessions': sessions,
+                   'requests': self.requests, 'moves': self.moves,
+                   'nodes': self.nodes, 'errors': dict(self.errors),
+                   'queued': self.queued, 'in_flight': self.in_flight,
+                   'moves_per_sec': self.moves / uptime if uptime else 0.0,
+                   'recent_moves_per_sec': recent / min(self.window, uptime)
+                   if uptime else 0.0}
+        for name, latencies in (('latency', self.latencies),
+                                ('search', self.search_latencies)):
+            latencies = np.array(latencies)
+            for percentile in (50, 90, 99):
+                metrics[f'{name}_p{percentile}_ms'] = float(
+                    np.percentile(latencies, percentile) * 1000) \
+                    if len(latencies) else 0.0
+
+        return metrics
+
+
+class TronServer:
+    """
+    A class for managing the server: the sessions of the clients, the
+    process pool of the searches and the metrics.
+
+    Each line received is a JSON request, answered by a JSON line carrying
+    the same 'id' (the replies of a connection can come out of order):
+        - {"type": "new", "width": 16, "height": 16, "settings": {...},
+          "simultaneous": false} opens a session, answered by
+          {"type": "created", "session": "1"}.
+        - {"type": "move", "session": "1", "player": 1, "grid": "...",
+          "positions": [[x1, y1], [x2, y2]], "deadline_ms": 100} asks the
+          move of a player on a position (grid encoded by
+          replay.encode_grid), answered by {"type": "move", "move": [0, 1],
+          "latency_ms": ..., "search_ms": ...}.
+        - {"type": "close", "session": "1"} closes a session.
+        - {"type": "metrics"} asks the metrics of the server.
+    A failed request is answered by {"type": "error", "error": kind}, where
+    kind is 'bad request', 'unknown session', 'busy' (too many requests
+    waiting for a worker) or 'expired' (the deadline passed).
+
+    Attributes:
+        processes (int): The number of worker processes.
+        executor (ProcessPoolExecutor): The pool of the searches.
+        workers (asyncio.Semaphore): The workers free to search, so that the
+         requests wait in the server, where their deadline is checked,
+         rather than in the pool.
+        max_queue (int): The number of move requests waiting for a worker
+         above which the next ones are rejected as 'busy'.
+        max_in_flight (int): The number of requests of a connection being
+         answered above which the connection is not read anymore, so that
+         TCP pushes back on the client.
+        deadline_ms (float): The deadline of the move requests without one.
+        table_mb (float): The memory budget of the transposition table of
+         each game of the workers.
+        sessions (dict): The settings and counters of each session, by id.
+        session_ids (itertools.count): The ids of the next sessions.
+        metrics (ServerMetrics): The metrics of the server.
+    """
+
+    def __init__(self, processes: int | None = None, max_queue: int = 64,
+                 max_in_flight: int = 16, deadline_ms: float = 1000,
+                 table_mb: float = 16) -> None:
+        """
+        :param processes: number of worker processes, None for one per core
+        :param max_queue: number of move requests waiting for a worker above
+         which the next ones are rejected
+        :param max_in_flight: number of requests of a connection answered at
+         the same time
+        :param deadline_ms: deadline of the move requests without one
+        :param table_mb: memory budget of the transposition tables
+        """
+        self.processes = processes or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.processes)
+        self.workers = asyncio.Semaphore(self.processes)
+        self.max_queue = max_queue
+        self.max_in_flight = max_in_flight
+        self.deadline_ms = deadline_ms
+        self.table_mb = table_mb
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.metrics = ServerMetrics()
+
+    async def start(self, host: str = '127.0.0.1',
+                    port: int = 8765) -> asyncio.Server:
+        """
+        Listen for the clients
+        :param host: address to listen on
+        :param port: to listen on, 0 for any free port
+        :return: the asyncio server
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self) -> None:
+        """
+        Stop the worker processes
+        """
+        self.executor.shutdown(cancel_futures=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Answer the requests of a connection until it is closed
+        :param reader: of the connection
+        :param writer: of the connection
+        """
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                # Stop reading while too many requests are being answered
+                await in_flight.acquire()
+                task = asyncio.create_task(self.respond(line, writer, lock,
+                                                        in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.CancelledError):
+            # The client left, or the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line: bytes, writer: asyncio.StreamWriter,
+                      lock: asyncio.Lock, in_flight: asyncio.Semaphore) \
+            -> None:
+        """
+        Answer a request and write the reply
+        :param line: of the request
+        :param writer: of the connection
+        :param lock: of the writes of the connection
+        :param in_flight: requests of the connection being answered
+        """
+        try:
+            response = await self.handle(line, time.perf_counter())
+        finally:
+            in_flight.release()
+        async with lock:
+            writer.write((json.dumps(response) + '\n').encode())
+            await writer.drain()
+
+    def error(self, kind: str, detail: str = '') -> dict:
+        """
+        Build the reply of a failed request, and count it
+        :param kind: of the error
+        :param detail: explanation of the error
+        :return: dict of the reply
+        """
+        self.metrics.errors[kind] += 1
+
+        return {'type': 'error', 'error': kind, 'detail': detail}
+
+    async def handle(self, line: bytes, received: float) -> dict:
+        """
+        Answer a request
+        :param line: of the request
+        :param received: time the request was received
+        :return: dict of the reply
+        """
+        self.metrics.requests += 1
+        message = {}
+        try:
+            message = json.loads(line)
+            handler = {'new': self.new_session, 'move': self.search_move,
+                       'close': self.close_session,
+                       'metrics': self.report_metrics}[message['type']]
+            response = await handler(message, received)
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            response = self.error('bad request', repr(error))
+        response['id'] = message.get('id') if isinstance(message, dict) \
+            else None
+
+        return response
+
+    async def new_session(self, message: dict, received: float) -> dict:
+        """
+        Open a session
+        :param message: of the request
+        :param received: time the request was received
+        :return: dict of the reply, with the id of the session
+        """
+        width, height = int(message['width']), int(message['height'])
+        settings = dict(message.get('settings', {}))
+        if not (3 <= width <= MAX_SIDE and 3 <= height <= MAX_SIDE) \
+                or not set(settings) <= set(SETTINGS):
+            raise ValueError(f'Invalid board {width}x{height} (sides from 3 '
+                             f'to {MAX_SIDE}) or settings {settings}, '
+                             f'expected keys among {SETTINGS}')
+        if settings.get('time_budget') is not None:
+            settings['time_budget'] = float(settings['time_budget'])
+        session = str(next(self.session_ids))
+        self.sessions[session] = {
+            'width': width, 'height': height, 'settings': settings,
+            'simultaneous': bool(message.get('simultaneous', False)),
+            'moves': 0}
+
+        return {'type': 'created', 'session': session}
+
+    async def close_session(self, message: dict, received: float) -> dict:
+        """
+        Close a session
+        :param message: of the request
+        :param received: time the request was received
+        :return: dict of the reply, with the number of moves of the session
+        """
+        session = self.sessions.pop(message['session'], None)
+        if session is None:
+            return self.error('unknown session', message['session'])
+
+        return {'type': 'closed', 'session': message['session'],
+                'moves': session['moves']}
+
+    async def report_metrics(self, message: dict, received: float) -> dict:
+        """
+        :param message: of the request
+        :param received: time the request was received
+        :return: dict of the reply, with the metrics of the server
+        """
+        return {'type': 'metrics',
+                **self.metrics.snapshot(len(self.sessions))}
+
+    async def search_move(self, message: dict, received: float) -> dict:
+        """
+        Search the move of a player in a worker process, within the deadline
+        of the request
+        :param message: of the request
+        :param received: time the request was received
+        :return: dict of the reply, with the move
+        """
+        session = self.sessions.get(message['session'])
+        if session is None:
+            return self.error('unknown session', message['session'])
+        width, height = session['width'], session['height']
+        number = int(message['player'])
+        if number not in (1, 2):
+            raise ValueError(f'Invalid player {number}')
+        positions = tuple((int(x), int(y)) for x, y in message['positions'])
+        # The players are on the inner cells, the border being walls
+        if len(positions) != 2 or not all(0 < x < width - 1
+                                          and 0 < y < height - 1
+                                          for x, y in positions):
+            raise ValueError(f'Invalid positions {positions} on a '
+                             f'{width}x{height} board')
+        grid = message['grid']
+        # 2 bits per cell, 2 hexadecimal digits per byte (see encode_grid)
+        if not isinstance(grid, str) or \
+                len(grid) != -(-width * height // 4) * 2:
+            raise ValueError(f'Invalid grid for a {width}x{height} board')
+        deadline = received + float(message.get('deadline_ms',
+                                                self.deadline_ms)) / 1000
+
+        if self.metrics.queued >= self.max_queue:
+            return self.error('busy', f'{self.metrics.queued} requests '
+                                      'waiting')
+        self.metrics.queued += 1
+        try:
+            await asyncio.wait_for(self.workers.acquire(),
+                                   deadline - time.perf_counter())
+        except asyncio.TimeoutError:
+            return self.error('expired', 'no worker before the deadline')
+        finally:
+            self.metrics.queued -= 1
+
+        remaining = deadline - time.perf_counter()
+        time_budget = remaining * SEARCH_SHARE
+        if session['settings'].get('time_budget') is not None:
+            time_budget = min(time_budget, session['settings']['time_budget'])
+        task = (width, height, session['simultaneous'], session['settings'],
+                self.table_mb, grid, positions, number, time_budget)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, search_position, task)
+        except BaseException:
+            # The done callback never runs without a future
+            self.workers.release()
+            raise
+        self.metrics.in_flight += 1
+
+        def done(_: asyncio.Future) -> None:
+            # The worker is free once the search ends, even if the reply
+            # was already sent as expired
+            self.metrics.in_flight -= 1
+            self.workers.release()
+
+        future.add_done_callback(done)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future),
+                                            max(remaining, 0))
+        except asyncio.TimeoutError:
+            return self.error('expired', 'the search ended after the '
+                                         'deadline')
+        except Exception as error:
+            return self.error('bad request', repr(error))
+
+        latency = time.perf_counter() - received
+        session['moves'] += 1
+        self.metrics.record_move(latency, result['search_ms'] / 1000,
+                                 result['nodes'])
+
+        return {'type': 'move', 'move': result['move'],
+                'latency_ms': latency * 1000,
+                'search_ms': result['search_ms']}
+
+
+async def serve(host: str, port: int, processes: int | None,
+                max_queue: int, max_in_flight: int,
+                deadline_ms: float) -> None:
+    """
+    Run the server until it is interrupted
+    :param host: address to listen on
+    :param port: to listen on
+    :param processes: number of worker processes
+    :param max_queue: number of move requests waiting above which the next
+     ones are rejected
+    :param max_in_flight: number of requests of a connection answered at
+     the same time
+    :param deadline_ms: deadline of the move requests without one
+    """
+    server = TronServer(processes, max_queue, max_in_flight, deadline_ms)
+    listener = await server.start(host, port)
+    addresses = [socket.getsockname() for socket in listener.sockets]
+    print(f'Listening on {addresses}')
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main() -> None:
+    """
+    Parse the command line and run the server
+    """
+    parser = argparse.ArgumentParser(description='Serve the moves of the '
+                                                 'Tron Game AI over TCP')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='port to listen on')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='number of processes searching the moves')
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help='move requests waiting for a worker above '
+                             'which the next ones are rejected')
+    parser.add_argument('--max-in-flight', type=int, default=16,
+                        help='requests of a connection answered at the '
+                             'same time')
+    parser.add_argument('--deadline-ms', type=float, default=1000,
+                        help='deadline of the move requests without one')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.processes,
+                          args.max_queue, args.max_in_flight,
+                          args.deadline_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
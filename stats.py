@@ -0,0 +1,108 @@
+""" Manage all the features related to the statistics of the search for the
+Tron Game """
+
+
+class SearchStats:
+    """
+    A class for managing the statistics of one search (one move).
+
+    Attributes:
+        nodes (int): The number of nodes visited.
+        interior_nodes (int): The number of nodes whose moves were explored.
+        cutoffs (int): The number of alpha-beta cutoffs.
+        first_move_cutoffs (int): The number of cutoffs caused by the first
+         move explored, the higher the better the move ordering.
+        leaf_evals (int): The number of positions evaluated at the leaves.
+        table_hits (int): The number of nodes found in the transposition
+         table.
+        table_cutoffs (int): The number of nodes whose score was taken from
+         the transposition table without searching them.
+        separated_leaves (int): The number of nodes evaluated as leaves
+         because the players were separated.
+        nodes_per_depth (dict): The number of nodes visited by each
+         iteration of the iterative deepening, by depth.
+        time_per_depth (dict): The time (seconds) spent by each iteration of
+         the iterative deepening, by depth.
+        duration (float): The time (seconds) spent by the whole search.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize every counter at zero
+        """
+        self.nodes = 0
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.leaf_evals = 0
+        self.table_hits = 0
+        self.table_cutoffs = 0
+        self.separated_leaves = 0
+        self.nodes_per_depth = {}
+        self.time_per_depth = {}
+        self.duration = 0.0
+
+    def cutoff_ratio(self) -> float:
+        """
+        Get the share of the cutoffs caused by the first move explored
+        :return: ratio between 0 and 1 (0 if there was no cutoff)
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def nodes_per_second(self) -> float:
+        """
+        Get the speed of the search
+        :return: nodes visited per second (0 if nothing was timed)
+        """
+        return self.nodes / self.duration if self.duration else 0.0
+
+    def branching_factors(self) -> dict[int, float]:
+        """
+        Get the effective branching factor of each iteration, the ratio
+        between its nodes and the nodes of the previous iteration
+        :return: dict of the branching factor, by depth
+        """
+        return {depth: nodes / self.nodes_per_depth[depth - 1]
+                for depth, nodes in self.nodes_per_depth.items()
+                if self.nodes_per_depth.get(depth - 1)}
+
+    def merge(self, other: 'SearchStats') -> None:
+        """
+        Add the statistics of another search (a worker of the parallel
+        search) to these ones
+        :param other: statistics to add
+        """
+        self.nodes += other.nodes
+        self.interior_nodes += other.interior_nodes
+        self.cutoffs += other.cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.leaf_evals += other.leaf_evals
+        self.table_hits += other.table_hits
+        self.table_cutoffs += other.table_cutoffs
+        self.separated_leaves += other.separated_leaves
+        for depth, nodes in other.nodes_per_depth.items():
+            self.nodes_per_depth[depth] = (self.nodes_per_depth.get(depth, 0)
+                                           + nodes)
+        # The workers search at the same time, an iteration lasts as long as
+        # its slowest worker
+        for depth, duration in other.time_per_depth.items():
+            self.time_per_depth[depth] = max(
+                self.time_per_depth.get(depth, 0.0), duration)
+
+    def to_dict(self) -> dict:
+        """
+        Get the statistics as a JSON serialisable dict, for the trace
+        :return: dict of the counters, the per-depth nodes and timings and
+         the derived ratios
+        """
+        return {'nodes': self.nodes, 'interior_nodes': self.interior_nodes,
+                'leaf_evals': self.leaf_evals, 'cutoffs': self.cutoffs,
+                'first_move_cutoffs': self.first_move_cutoffs,
+                'cutoff_ratio': self.cutoff_ratio(),
+                'table_hits': self.table_hits,
+                'table_cutoffs': self.table_cutoffs,
+                'separated_leaves': self.separated_leaves,
+                'nodes_per_depth': self.nodes_per_depth,
+                'time_per_depth': self.time_per_depth,
+                'duration': self.duration,
+                'nodes_per_sec': self.nodes_per_second()}
@@ -0,0 +1,45 @@
+""" Regression tests of the bounds of the space filling search """
+
+import random
+import time
+import numpy as np
+from board import Board
+from endgame import SpaceFiller
+
+
+def irregular_chamber(seed: int) -> tuple[Board, int]:
+    """
+    Build a 32x32 board whose inner cells are scattered with obstacles
+    :param seed: of the obstacles
+    :return: tuple (board, index) of the board and the position of the
+     player, at its center
+    """
+    rng = random.Random(seed)
+    grid = -np.ones((32, 32), dtype=np.int8)
+    grid[1:-1, 1:-1] = 0
+    for _ in range(32 * 32 // 8):
+        grid[rng.randrange(1, 31), rng.randrange(1, 31)] = -1
+    grid[16, 16] = 1
+    board = Board.from_grid(grid)
+
+    return board, board.index(16, 16)
+
+
+def test_best_move_within_time_budget():
+    for seed in range(3):
+        board, index = irregular_chamber(seed)
+        filler = SpaceFiller(board)
+        start = time.perf_counter()
+        length, move = filler.best_move(index, board.free(), 0.05)
+
+        assert time.perf_counter() - start < 0.075
+        assert length > 0 and move != (0, 0)
+
+
+def test_best_move_without_time_budget_is_bounded():
+    board, index = irregular_chamber(0)
+    filler = SpaceFiller(board, max_nodes=100)
+    length, move = filler.best_move(index, board.free())
+
+    assert filler.nodes <= 101
+    assert length > 0 and move != (0, 0)
@@ -0,0 +1,53 @@
+""" Regression tests of the analysis of the regions of the Game """
+
+from game import Game
+from player import Player
+
+
+def walled_game(track_regions: bool) -> Game:
+    """
+    Build a 10x10 game where the heads are adjacent, each one at the top of a
+    wall of its trail: the player 1 is left with 2 columns, the player 2 with
+    4 columns
+    :param track_regions: read the regions from the RegionTracker
+    :return: the game, player 1 at (3, 4) and player 2 at (4, 4)
+    """
+    player_1 = Player(x=3, y=4, number=1, color='red', wall_color='orange')
+    player_2 = Player(x=4, y=4, number=2, color='blue', wall_color='cyan')
+    game = Game(10, 10, player_1, player_2, verbose=False,
+                track_regions=track_regions)
+    grid = game.grid.copy()
+    grid[3, 1:-1] = 1
+    grid[4, 1:-1] = 2
+    game.load_position(grid, (3, 4), (4, 4))
+
+    return game
+
+
+def test_adjacent_heads_are_not_connected():
+    game = walled_game(track_regions=False)
+
+    assert game.analyse_space(game.player_1, game.player_2) == (False, 17, 33)
+    assert game.evaluate_board(game.player_1, game.player_2) < 0
+
+
+def test_connected_player_reaches_its_own_region():
+    # The head of the player 1 opens on both sides of its wall, the player 2
+    # is on the left side only
+    player_1 = Player(x=3, y=4, number=1, color='red', wall_color='orange')
+    player_2 = Player(x=1, y=1, number=2, color='blue', wall_color='cyan')
+    game = Game(10, 10, player_1, player_2, verbose=False,
+                track_regions=False)
+    grid = game.grid.copy()
+    grid[3, 1:-1] = 1
+    game.load_position(grid, (3, 4), (1, 1))
+
+    assert game.analyse_space(player_1, player_2) == (True, 56, 16)
+
+
+def test_tracked_regions_match_the_flood():
+    flooded, tracked = walled_game(False), walled_game(True)
+
+    assert tracked.analyse_space(tracked.player_1, tracked.player_2) \
+        == flooded.analyse_space(flooded.player_1, flooded.player_2) \
+        == (False, 17, 33)
@@ -0,0 +1,37 @@
+""" Regression tests of the RegionTracker """
+
+from board import Board
+from game import Game
+from player import Player
+from regions import RegionTracker
+
+
+def test_adjacent_heads_in_separate_regions():
+    # Each head tops a wall of its trail, splitting the 8x8 inner cells
+    player_1 = Player(x=3, y=4, number=1, color='red', wall_color='orange')
+    player_2 = Player(x=4, y=4, number=2, color='blue', wall_color='cyan')
+    grid = Game.init_grid(10, 10, player_1, player_2)
+    grid[3, 1:-1] = 1
+    grid[4, 1:-1] = 2
+    board = Board.from_grid(grid)
+    tracker = RegionTracker(board)
+
+    assert tracker.analyse(board.index(3, 4), board.index(4, 4)) \
+        == (False, 17, 33)
+    assert tracker.analyse(board.index(4, 4), board.index(3, 4)) \
+        == (False, 33, 17)
+
+
+def test_search_moves_are_undone():
+    player_1 = Player(x=2, y=2, number=1, color='red', wall_color='orange')
+    player_2 = Player(x=7, y=7, number=2, color='blue', wall_color='cyan')
+    board = Board.from_grid(Game.init_grid(10, 10, player_1, player_2))
+    tracker = RegionTracker(board)
+    components = tracker.components
+    for y in range(1, 9):
+        tracker.occupy(board.index(5, y), undoable=True)
+
+    assert len(tracker.components) == 2
+    for y in reversed(range(1, 9)):
+        tracker.release(board.index(5, y))
+    assert tracker.components == components and not tracker.history
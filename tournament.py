@@ -0,0 +1,211 @@
+""" Manage all the features related to the headless tournaments of the Tron
+Game, used to measure the strength and the speed of the AI """
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+import numpy as np
+from game import Game
+from player import Player
+from tracing import TraceSink
+
+
+def parse_size(size: str) -> tuple[int, int]:
+    """
+    Parse a board size
+    :param size: of the board, as 'WIDTHxHEIGHT'
+    :return: tuple (width, height)
+    """
+    width, height = size.lower().split('x')
+
+    return int(width), int(height)
+
+
+def parse_settings(settings: str) -> dict:
+    """
+    Parse the search settings of a player
+    :param settings: as 'key=value,key=value' (time_budget, max_depth,
+     evaluator, engine), 'none' for no limit
+    :return: dict of the search settings
+    """
+    parsed = {}
+    for item in filter(None, settings.split(',')):
+        key, value = item.split('=')
+        if value.lower() == 'none':
+            parsed[key] = None
+        elif key == 'time_budget':
+            parsed[key] = float(value)
+        elif key == 'max_depth':
+            parsed[key] = int(value)
+        else:
+            parsed[key] = value
+
+    return parsed
+
+
+def play_game(task: tuple) -> dict:
+    """
+    Play one game without GUI
+    :param task: tuple (width, height, seed, settings of player 1, settings
+     of player 2, simultaneous moves, path of the trace or None)
+    :return: dict of the record of the game
+    """
+    width, height, seed, settings_1, settings_2, simultaneous, trace = task
+    spawn_1, spawn_2 = Game.spawn_positions(width, height, random.Random(seed))
+    player_1 = Player(x=spawn_1[0], y=spawn_1[1], number=1, color='red',
+                      wall_color='orange', search_settings=settings_1)
+    player_2 = Player(x=spawn_2[0], y=spawn_2[1], number=2, color='blue',
+                      wall_color='cyan', search_settings=settings_2)
+    sink = TraceSink(trace) if trace is not None else None
+    game = Game(width=width, height=height, player_1=player_1,
+                player_2=player_2, verbose=False, simultaneous=simultaneous,
+                trace=sink)
+
+    start = time.perf_counter()
+    result = game.play()
+    if sink is not None:
+        sink.close()
+
+    return {'size': f'{width}x{height}', 'seed': seed, 'result': result,
+            'ticks': game.ticks, 'nodes': game.nodes,
+            'duration': time.perf_counter() - start,
+            'latencies': {number: latencies for number, latencies
+                          in game.latencies.items()}}
+
+
+def summarise(records: list[dict]) -> dict:
+    """
+    Aggregate the records of the games
+    :param records: of the games played
+    :return: dict of the win/draw/loss of player 1, the moves per second and
+     the latency percentiles (milliseconds) of each player
+    """
+    summary = {'games': len(records),
+               'wins': sum(record['result'] == 1 for record in records),
+               'draws': sum(record['result'] == 0 for record in records),
+               'losses': sum(record['result'] == 2 for record in records)}
+    for number in (1, 2):
+        latencies = np.array([latency for record in records
+                              for latency in record['latencies'][number]])
+        moves = len(latencies)
+        summary[f'player_{number}'] = {
+            'moves': moves,
+            'moves_per_sec': moves / latencies.sum() if moves else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50) * 1000) if moves else 0.0,
+            'p90_ms': float(np.percentile(latencies, 90) * 1000) if moves else 0.0,
+            'p99_ms': float(np.percentile(latencies, 99) * 1000) if moves else 0.0,
+            'max_ms': float(latencies.max() * 1000) if moves else 0.0,
+        }
+
+    return summary
+
+
+def write_report(report: dict, path: str) -> None:
+    """
+    Write the report of the tournament, as JSON or CSV (one row per board
+    size) according to the extension of the path
+    :param report: of the tournament
+    :param path: of the report file
+    """
+    if not path.endswith('.csv'):
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['size', 'games', 'wins', 'draws', 'losses', 'player',
+                         'moves', 'moves_per_sec', 'p50_ms', 'p90_ms',
+                         'p99_ms', 'max_ms'])
+        for size, summary in report['sizes'].items():
+            for number in (1, 2):
+                stats = summary[f'player_{number}']
+                writer.writerow([size, summary['games'], summary['wins'],
+                                 summary['draws'], summary['losses'], number,
+                                 stats['moves'], stats['moves_per_sec'],
+                                 stats['p50_ms'], stats['p90_ms'],
+                                 stats['p99_ms'], stats['max_ms']])
+
+
+def run_tournament(sizes: list[tuple[int, int]], games: int, seed: int,
+                   settings_1: dict, settings_2: dict,
+                   processes: int | None = None,
+                   simultaneous: bool = False,
+                   trace: str | None = None) -> dict:
+    """
+    Play the games of every board size across a pool of processes
+    :param sizes: list of (width, height) of the boards
+    :param games: number of games per board size
+    :param seed: of the first game, the next ones use the following seeds
+    :param settings_1: search settings of player 1
+    :param settings_2: search settings of player 2
+    :param processes: number of processes, None for one per core
+    :param simultaneous: both players move at the same time
+    :param trace: path of the JSON-lines trace of every game, None for no
+     trace
+    :return: dict of the report (summary overall and per board size)
+    """
+    tasks = [(width, height, seed + i, settings_1, settings_2, simultaneous,
+              trace) for width, height in sizes for i in range(games)]
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        records = list(pool.imap_unordered(play_game, tasks, chunksize=4))
+
+    by_size = {}
+    for record in records:
+        by_size.setdefault(record['size'], []).append(record)
+
+    return {'settings': {'player_1': settings_1, 'player_2': settings_2,
+                         'seed': seed, 'simultaneous': simultaneous},
+            'duration': time.perf_counter() - start,
+            'overall': summarise(records),
+            'sizes': {size: summarise(by_size[size]) for size in
+                      sorted(by_size, key=lambda size: parse_size(size))}}
+
+
+def main() -> None:
+    """
+    Parse the command line and run the tournament
+    """
+    parser = argparse.ArgumentParser(description='Play Tron games without '
+                                                 'GUI and report the results')
+    parser.add_argument('--sizes', nargs='+', default=['8x8'],
+                        help='board sizes, as WIDTHxHEIGHT')
+    parser.add_argument('--games', type=int, default=100,
+                        help='number of games per board size')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the spawns of the first game')
+    parser.add_argument('--player-1', default='',
+                        help='search settings of player 1, as '
+                             'time_budget=0.05,max_depth=7,evaluator=voronoi,'
+                             'engine=mcts')
+    parser.add_argument('--player-2', default='',
+                        help='search settings of player 2')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='number of processes playing the games')
+    parser.add_argument('--simultaneous', action='store_true',
+                        help='both players move at the same time')
+    parser.add_argument('--output', default='tournament.json',
+                        help='report file, .json or .csv')
+    parser.add_argument('--trace', default=None,
+                        help='JSON-lines trace of the searches of every game')
+    args = parser.parse_args()
+
+    report = run_tournament([parse_size(size) for size in args.sizes],
+                            args.games, args.seed,
+                            parse_settings(args.player_1),
+                            parse_settings(args.player_2), args.processes,
+                            args.simultaneous, args.trace)
+    write_report(report, args.output)
+    overall = report['overall']
+    print(f"{overall['games']} games in {report['duration']:.1f}s: "
+          f"{overall['wins']} wins, {overall['draws']} draws, "
+          f"{overall['losses']} losses for player 1")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+""" Manage all the features related to the tracing and the profiling of the
+search for the Tron Game """
+
+import cProfile
+import json
+import sys
+import threading
+import time
+from typing import TextIO
+
+
+class TraceSink:
+    """
+    A class for managing a JSON-lines trace: one JSON object per event, with
+    its name and its time, so that the logs can be parsed by other tools.
+
+    Attributes:
+        file (TextIO): The file the events are written to.
+        owned (bool): The file was opened by the sink, which closes it.
+        lock (threading.Lock): Serialise the events written from several
+         threads (the GUI and its worker thread).
+    """
+
+    def __init__(self, output: str | TextIO | None = None) -> None:
+        """
+        :param output: path of the trace file (appended to), an open file,
+         or None for the standard output
+        """
+        self.owned = isinstance(output, str)
+        if self.owned:
+            self.file = open(output, 'a')
+        else:
+            self.file = output if output is not None else sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event: str, **fields) -> None:
+        """
+        Write one event to the trace
+        :param event: name of the event
+        :param fields: values of the event, JSON serialisable
+        """
+        line = json.dumps({'event': event, 'time': time.time(), **fields})
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self) -> None:
+        """
+        Close the trace file if it was opened by the sink
+        """
+        if self.owned:
+            self.file.close()
+
+
+class Profiler:
+    """
+    A class for managing the profiling of the searches: the profiler only
+    runs during the searches, and its report accumulates over all of them.
+
+    Attributes:
+        kind (str): The profiler used, 'cprofile' or 'pyinstrument'.
+        output (str): The path of the report, written by close.
+        profiler: The cProfile.Profile or pyinstrument.Profiler.
+    """
+
+    def __init__(self, kind: str = 'cprofile',
+                 output: str = 'search.prof') -> None:
+        """
+        :param kind: profiler used, 'cprofile' (report readable by pstats)
+         or 'pyinstrument' (text report, HTML if the path ends with .html)
+        :param output: path of the report
+        """
+        self.kind = kind
+        self.output = output
+        if kind == 'cprofile':
+            self.profiler = cProfile.Profile()
+        elif kind == 'pyinstrument':
+            try:
+                import pyinstrument
+            except ImportError as error:
+                raise ImportError('The pyinstrument profiler requires the '
+                                  'pyinstrument package') from error
+            self.profiler = pyinstrument.Profiler()
+        else:
+            raise ValueError(f'Unknown profiler: {kind}')
+
+    def start(self) -> None:
+        """
+        Start (or resume) the profiling, before a search
+        """
+        if self.kind == 'cprofile':
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self) -> None:
+        """
+        Pause the profiling, after a search
+        """
+        if self.kind == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def close(self) -> None:
+        """
+        Write the report of every search profiled
+        """
+        if self.kind == 'cprofile':
+            self.profiler.dump_stats(self.output)
+            return
+
+        with open(self.output, 'w') as file:
+            file.write(self.profiler.output_html()
+                       if self.output.endswith('.html')
+                       else self.profiler.output_text())
@@ -0,0 +1,132 @@
+""" Manage all the features related to the Transposition Table (Zobrist
+hashing) for the Tron Game """
+
+import random
+from board import Board
+from player import Player
+
+# Bound type of a stored score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class Zobrist:
+    """
+    A class for managing the Zobrist keys of the Tron game positions.
+
+    Attributes:
+        cells (dict): For each player number, a random key per cell of its
+         trail.
+        heads (dict): For each player number, a random key per head position.
+        to_move (dict): For each player number, the key of "player to move".
+        perspective (dict): For each player number, the key of "player
+         maximized by the search".
+    """
+
+    def __init__(self, cells: int, numbers: list[int], seed: int = 0) -> None:
+        """
+        :param cells: number of cells of the grid
+        :param numbers: of the players of the game
+        :param seed: of the random generator, to get reproducible keys
+        """
+        rng = random.Random(seed)
+        self.cells = {number: [rng.getrandbits(64) for _ in range(cells)]
+                      for number in numbers}
+        self.heads = {number: [rng.getrandbits(64) for _ in range(cells)]
+                      for number in numbers}
+        self.to_move = {number: rng.getrandbits(64) for number in numbers}
+        self.perspective = {number: rng.getrandbits(64) for number in numbers}
+
+    def hash_board(self, board: Board, players: list[Player]) -> int:
+        """
+        Compute the key of a position from scratch (the search then updates
+        it incrementally)
+        :param board: bitboard of the game
+        :param players: of the game
+        :return: the Zobrist key of the trails and the heads
+        """
+        key = 0
+        for player in players:
+            trail = board.trails.get(player.number, 0)
+            while trail:
+                bit = trail & -trail
+                key ^= self.cells[player.number][bit.bit_length() - 1]
+                trail ^= bit
+            key ^= self.heads[player.number][board.index(player.x, player.y)]
+
+        return key
+
+
+class TranspositionTable:
+    """
+    A class for managing the Transposition Table of the minimax search.
+
+    The table is a fixed number of buckets, each with two entries: one kept
+    for the deepest search (depth-preferred) and one always replaced.
+
+    Attributes:
+        buckets (int): The number of buckets of the table.
+        keys (list): The key stored in each entry.
+        entries (list): The (depth, score, bound, best move) of each entry.
+        hits (int): The number of successful probes.
+        misses (int): The number of failed probes.
+        stores (int): The number of entries written.
+    """
+
+    # Rough memory cost of an entry (key, tuple and its items)
+    ENTRY_BYTES = 160
+
+    def __init__(self, size_mb: float = 16) -> None:
+        """
+        :param size_mb: memory budget of the table in megabytes
+        """
+        self.buckets = max(1, int(size_mb * 2 ** 20) // (2 * self.ENTRY_BYTES))
+        self.keys = [None] * (2 * self.buckets)
+        self.entries = [None] * (2 * self.buckets)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, tuple[int, int]] | None:
+        """
+        Look for a position in the table
+        :param key: Zobrist key of the position
+        :return: tuple (depth, score, bound, best move) or None if missing
+        """
+        slot = 2 * (key % self.buckets)
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.entries[slot]
+        if self.keys[slot + 1] == key:
+            self.hits += 1
+            return self.entries[slot + 1]
+        self.misses += 1
+
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int,
+              move: tuple[int, int]) -> None:
+        """
+        Save the result of a search, in the depth-preferred entry if it is at
+        least as deep as the one already there, else in the always-replace one
+        :param key: Zobrist key of the position
+        :param depth: of the search below the position
+        :param score: found for the position
+        :param bound: EXACT, LOWER (real score >= score) or UPPER (real
+         score <= score)
+        :param move: best move found for the position
+        """
+        slot = 2 * (key % self.buckets)
+        entry = self.entries[slot]
+        if entry is not None and self.keys[slot] != key and depth < entry[0]:
+            slot += 1
+        self.keys[slot] = key
+        self.entries[slot] = (depth, score, bound, move)
+        self.stores += 1
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters
+        """
+        self.keys = [None] * (2 * self.buckets)
+        self.entries = [None] * (2 * self.buckets)
+        self.hits = self.misses = self.stores = 0